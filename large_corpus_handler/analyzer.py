@@ -0,0 +1,79 @@
+"""
+Student ID: 21207500
+Student Name: Liyan Tao
+"""
+
+import os
+import sys
+import time
+import string
+from stemmer import StemTable
+
+PUNCTUATION = '!"#$%&\'()*+,-./:;<=>?@[\\]^_`{|}~'
+REMOVE_PUNCTUATION = str.maketrans('', '', PUNCTUATION)  # Built once instead of on every document and query
+ASCII_LOWER = bytes.maketrans(string.ascii_uppercase.encode(), string.ascii_lowercase.encode())
+PUNCTUATION_BYTES = PUNCTUATION.encode()
+
+
+class Analyzer:
+    def __init__(self, stopwords, stems):
+        """Turn documents and queries into index terms: convert to lowercase, remove punctuation, split into words, remove stopwords and perform stemming. Stopwords live in the stem table with an empty stem, so one lookup per word does both of the last two steps."""
+        self.stems = stems
+        stems.drop_stopwords(stopwords)
+
+    def analyze(self, text):
+        """Return the terms of a text."""
+        return [term for term in map(self.stems.__getitem__, text.lower().translate(REMOVE_PUNCTUATION).split()) if term]
+
+    def analyze_file(self, file_path):
+        """Return the terms of a UTF-8 document file."""
+        with open(file_path, 'rb') as file:
+            return self.analyze_bytes(file.read())
+
+    def analyze_bytes(self, data):
+        """Return the terms of the raw UTF-8 content of a document. Pure ASCII documents are lowercased and stripped of punctuation by a single bytes.translate before decoding."""
+        if data.isascii():
+            text = data.translate(ASCII_LOWER, PUNCTUATION_BYTES).decode('ascii')
+        else:
+            text = data.decode('utf-8').lower().translate(REMOVE_PUNCTUATION)
+        return [term for term in map(self.stems.__getitem__, text.split()) if term]
+
+
+def original_analyze_file(file_path, stopwords, stemmer, stemmer_accelerator):
+    """The preprocessing of a document before the analyzer: read, lowercase, build the punctuation table, translate, split, then a pass each for stopwords and stemming."""
+    with open(file_path, 'r', encoding='UTF-8') as file:
+        text = file.read().lower()
+    text = text.translate(str.maketrans('', '', PUNCTUATION))
+    tokens = text.split()
+    tokens = [term for term in tokens if term not in stopwords]
+    stemmed_tokens = []
+    for term in tokens:
+        if term not in stemmer_accelerator:
+            stemmer_accelerator[term] = stemmer.stem(term)
+        stemmed_tokens.append(stemmer_accelerator[term])
+    return stemmed_tokens
+
+
+def main():
+    """Micro-benchmark: analyze every GX document under a directory with the original preprocessing and with the analyzer, check the terms are identical and report tokens per second."""
+    from files import porter
+    documents_dir_path, stopwords_file_path = sys.argv[1], sys.argv[2]
+    with open(stopwords_file_path, 'r', encoding='UTF-8') as file:
+        stopwords = set(line.strip() for line in file)
+    file_paths = [os.path.join(root, filename) for root, _, filenames in os.walk(documents_dir_path) for filename in filenames if filename.startswith("GX")]
+    stemmer, stemmer_accelerator = porter.PorterStemmer(), {}
+    analyzer = Analyzer(stopwords, StemTable())
+    results = []
+    for name, analyze in (("original", lambda path: original_analyze_file(path, stopwords, stemmer, stemmer_accelerator)),
+                          ("analyzer", analyzer.analyze_file)):
+        start = time.time()
+        terms = [analyze(file_path) for file_path in file_paths]
+        duration = time.time() - start
+        tokens = sum(len(document_terms) for document_terms in terms)
+        print(f"{name}: {tokens} tokens of {len(file_paths)} documents in {duration:.4f} seconds, {tokens / duration:,.0f} tokens/s.")
+        results.append(terms)
+    print("Terms are identical." if results[0] == results[1] else "Terms differ!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,372 @@
+"""
+Student ID: 21207500
+Student Name: Liyan Tao
+"""
+
+import os
+import mmap
+import struct
+from array import array
+from itertools import accumulate
+
+# File layout (all integers little-endian):
+#   header      | fixed HEADER_SIZE bytes, see HEADER_FORMAT
+#   postings    | per term (in sorted term order): doc ids as uint32[df], then BM25 impacts as float32[df]
+#               | (raw term frequencies as uint32[df] when FLAG_RAW_TF is set), then the maximum of every block of
+#               | BLOCK_SIZE postings as float32[ceil(df / BLOCK_SIZE)] for block-max query processing.
+#               | With FLAG_COMPRESSED the doc ids are stored as gaps instead: one width byte (1, 2 or 4) per block,
+#               | then the gaps of every block packed with its width, zero padded to a multiple of 4 bytes.
+#               | With impact_bits 8 or 16 the impacts are quantised codes uint8[df] / uint16[df] (zero padded to a multiple
+#               | of 4 bytes) and the block maxima are the largest code of each block: impact = code * scale, with the
+#               | global impact_scale of the header or, with FLAG_TERM_SCALE, a per-term scale of max impact / max code.
+#               | Since version 6 compressed postings end with the last doc id of every block as uint32[ceil(df / BLOCK_SIZE)],
+#               | so a query cursor can skip to the block holding a doc id and decode only that block.
+#   term table  | per term: TERM_RECORD_FORMAT record (term blob offset, term length, postings offset, df, max impact)
+#   term blob   | UTF-8 bytes of all terms, concatenated in sorted order
+#   docno table | uint32[num_docs + 1] offsets into the docno blob, then the UTF-8 bytes of all docnos
+#   doc lengths | optional uint32[num_docs], written for raw term frequency indexes
+MAGIC = b'BM25IDX\x00'
+VERSION = 6
+SUPPORTED_VERSIONS = (3, 4, 5, 6)  # Older files have no compressed postings, quantised impacts or block last doc ids, they are read as before
+HEADER_FORMAT = '<8sIIIIQdQQQQQId'  # magic, version, flags, num_docs, num_terms, num_postings, avg_doc_len, section offsets, impact_bits, impact_scale
+HEADER_SIZE = 128
+TERM_RECORD_FORMAT = '<IIQIf'
+TERM_RECORD_SIZE = struct.calcsize(TERM_RECORD_FORMAT)
+BLOCK_SIZE = 128  # Number of postings summarised by one block maximum and packed together in compressed postings
+FLAG_RAW_TF = 1  # Postings hold raw term frequencies instead of BM25 impacts (index segments scored at query time)
+FLAG_COMPRESSED = 2  # Doc ids are stored as gaps packed in blocks of BLOCK_SIZE
+FLAG_TERM_SCALE = 4  # Quantised impacts use one scale per term instead of the global impact_scale
+GAP_TYPECODES = {1: 'B', 2: 'H', 4: 'I'}  # Width in bytes of the packed gaps of a block -> array typecode
+CODE_TYPECODES = {8: 'B', 16: 'H'}  # Bits of a quantised impact -> array typecode
+
+
+def encode_doc_ids(doc_ids):
+    """Encode ascending doc ids as gaps, packed block by block with the smallest width that holds every gap of the block."""
+    gaps = [doc_id - previous for previous, doc_id in zip([0] + doc_ids[:-1], doc_ids)]
+    widths = bytearray()
+    packed = bytearray()
+    for i in range(0, len(gaps), BLOCK_SIZE):
+        block = gaps[i:i + BLOCK_SIZE]
+        largest = max(block)
+        width = 1 if largest < 1 << 8 else 2 if largest < 1 << 16 else 4
+        widths.append(width)
+        packed += array(GAP_TYPECODES[width], block).tobytes()
+    encoded = widths + packed
+    return encoded + b'\x00' * (-len(encoded) % 4)
+
+
+def block_last_doc_ids(doc_ids):
+    """Return the last doc id of every block of BLOCK_SIZE postings."""
+    last_doc_ids = list(doc_ids[BLOCK_SIZE - 1::BLOCK_SIZE])
+    if len(doc_ids) % BLOCK_SIZE:
+        last_doc_ids.append(doc_ids[-1])
+    return last_doc_ids
+
+
+class PackedDocIds:
+    def __init__(self, buffer, postings_offset, df):
+        """Compressed doc ids of one term, decoded block by block on demand. block_last_docs (the last doc id of every block) tells which block holds a doc id without decoding any; the reader sets it, the table follows the impacts."""
+        self.buffer = buffer
+        self.df = df
+        self.block_last_docs = None
+        num_blocks = -(-df // BLOCK_SIZE)
+        self.widths = bytes(buffer[postings_offset:postings_offset + num_blocks])
+        # Offset of the packed gaps of every block, all blocks but the last hold BLOCK_SIZE gaps
+        self.block_offsets = list(accumulate((width * BLOCK_SIZE for width in self.widths), initial=postings_offset + num_blocks))
+        end = self.block_offsets[-1] - self.widths[-1] * (num_blocks * BLOCK_SIZE - df)
+        self.end = end + (-(end - postings_offset) % 4)  # Offset of the impacts
+
+    def __len__(self):
+        return self.df
+
+    def block(self, i):
+        """Decode the doc ids of the i-th block: its gaps start from the last doc id of the previous block."""
+        width = self.widths[i]
+        start = self.block_offsets[i]
+        count = min(BLOCK_SIZE, self.df - i * BLOCK_SIZE)
+        gaps = self.buffer[start:start + width * count].cast(GAP_TYPECODES[width])
+        return list(accumulate(gaps, initial=self.block_last_docs[i - 1] if i else 0))[1:]
+
+    def tolist(self):
+        """Decode every doc id."""
+        doc_ids = []
+        for i in range(len(self.widths)):
+            doc_ids += self.block(i)
+        return doc_ids
+
+    def __iter__(self):
+        return iter(self.tolist())
+
+
+class DocnoTable:
+    def __init__(self, offsets=None, blob=None):
+        """Document names by integer doc id, packed into one UTF-8 blob: the name of doc id i is blob[offsets[i]:offsets[i + 1]]."""
+        self.offsets = array('I', [0]) if offsets is None else offsets
+        self.blob = bytearray() if blob is None else blob
+
+    def append(self, docno):
+        """Add the name of the next document and return its doc id."""
+        self.blob += docno.encode('utf-8')
+        self.offsets.append(len(self.blob))
+        return len(self.offsets) - 2
+
+    def extend(self, other):
+        """Append all documents of another table, their doc ids follow the ones already in this table."""
+        base = len(self.blob)
+        self.blob += other.blob
+        self.offsets.extend(offset + base for offset in other.offsets[1:])
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, doc_id):
+        return str(self.blob[self.offsets[doc_id]:self.offsets[doc_id + 1]], 'utf-8')
+
+    def __iter__(self):
+        for doc_id in range(len(self)):
+            yield self[doc_id]
+
+
+class BinaryIndexWriter:
+    def __init__(self, file_path, raw_tf=False, compressed=True, impact_bits=0, impact_scale=None):
+        """impact_bits 8 or 16 quantises the impacts: with the global impact_scale (an impact upper bound divided by the largest code) when given, with a scale per term otherwise."""
+        if raw_tf and impact_bits:
+            raise ValueError("Raw term frequencies cannot be quantised.")
+        self.file_path = file_path
+        self.raw_tf = raw_tf
+        self.compressed = compressed
+        self.impact_bits = impact_bits
+        self.impact_scale = impact_scale
+        # Written under a temporary name and renamed by finish(), so a running query server that maps the old file keeps it intact
+        self.temp_path = file_path + '.tmp'
+        self.file = open(self.temp_path, 'wb')
+        self.file.write(b'\x00' * HEADER_SIZE)  # Placeholder, the header is written once all sections are known
+        self.term_records = []
+        self.term_blob = bytearray()
+        self.num_postings = 0
+        self.last_term = None
+
+    def add_term(self, term, doc_ids, impacts):
+        """Append the postings of one term. Terms must be added in sorted order and doc ids must be ascending. impacts are raw term frequencies for a raw_tf index."""
+        if self.last_term is not None and term <= self.last_term:
+            raise ValueError(f"Terms must be added in sorted order: '{term}' after '{self.last_term}'")
+        self.last_term = term
+        encoded_term = term.encode('utf-8')
+        postings_offset = self.file.tell()
+        doc_ids = array('I', doc_ids)
+        self.file.write(encode_doc_ids(doc_ids.tolist()) if self.compressed else doc_ids.tobytes())
+        impacts = array('I' if self.raw_tf else 'f', impacts)
+        max_impact = max(impacts)
+        if self.impact_bits:
+            impacts, max_impact = self.quantise(impacts)
+        self.file.write(impacts.tobytes())
+        self.file.write(b'\x00' * (-self.file.tell() % 4))
+        self.file.write(array('f', [max(impacts[i:i + BLOCK_SIZE]) for i in range(0, len(impacts), BLOCK_SIZE)]).tobytes())
+        if self.compressed:
+            self.file.write(array('I', block_last_doc_ids(doc_ids)).tobytes())
+        self.term_records.append((len(self.term_blob), len(encoded_term), postings_offset, len(impacts), max_impact))
+        self.term_blob += encoded_term
+        self.num_postings += len(impacts)
+
+    def quantise(self, impacts):
+        """Turn the float32 impacts of a term into integer codes. Returns (codes, value stored as the term's max impact): the largest code with the global scale, the max impact the term scale is derived from otherwise."""
+        max_code = (1 << self.impact_bits) - 1
+        if self.impact_scale is not None:
+            scale = self.impact_scale
+        else:
+            scale = max(impacts) / max_code
+        # A positive impact smaller than half a step still gets code 1, so a document matching a very common term keeps a positive score
+        codes = array(CODE_TYPECODES[self.impact_bits], [max(1, min(max_code, round(impact / scale))) if impact > 0 and scale > 0 else 0 for impact in impacts])
+        return codes, max(codes) if self.impact_scale is not None else max(impacts)
+
+    def finish(self, docnos, avg_doc_len, doc_lens=None):
+        """Write the term dictionary, the docno table (a DocnoTable or doc names in doc id order) and optionally the document lengths after the postings, then fill in the header."""
+        term_table_offset = self.file.tell()
+        for record in self.term_records:
+            self.file.write(struct.pack(TERM_RECORD_FORMAT, *record))
+        term_blob_offset = self.file.tell()
+        self.file.write(self.term_blob)
+        self.file.write(b'\x00' * (-self.file.tell() % 4))  # Keep the docno offsets 4-byte aligned
+        docno_table_offset = self.file.tell()
+        if not isinstance(docnos, DocnoTable):
+            table = DocnoTable()
+            for docno in docnos:
+                table.append(docno)
+            docnos = table
+        self.file.write(docnos.offsets.tobytes())
+        self.file.write(docnos.blob)
+        doc_lens_offset = 0
+        if doc_lens is not None:
+            self.file.write(b'\x00' * (-self.file.tell() % 4))
+            doc_lens_offset = self.file.tell()
+            self.file.write(array('I', doc_lens).tobytes())
+        self.file.seek(0)
+        flags = (FLAG_RAW_TF if self.raw_tf else 0) | (FLAG_COMPRESSED if self.compressed else 0)
+        if self.impact_bits and self.impact_scale is None:
+            flags |= FLAG_TERM_SCALE
+        self.file.write(struct.pack(HEADER_FORMAT, MAGIC, VERSION, flags,
+                                    len(docnos), len(self.term_records), self.num_postings, avg_doc_len,
+                                    term_table_offset, term_blob_offset, docno_table_offset, HEADER_SIZE,
+                                    doc_lens_offset, self.impact_bits, self.impact_scale or 0))
+        self.file.close()
+        os.replace(self.temp_path, self.file_path)  # Atomic, readers either see the old or the new index
+
+
+class BinaryIndexReader:
+    def __init__(self, file_path, buffer=None):
+        """Map the index file, or read the index from a buffer holding the whole file (e.g. a copy in shared memory, see shared_index.py)."""
+        self.file_path = file_path
+        self.mm = None
+        if buffer is None:
+            with open(file_path, 'rb') as file:
+                # The mapping stays valid after the file is closed; pages are only read when they are touched
+                self.mm = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            buffer = self.mm
+        self.buffer = memoryview(buffer)
+        (magic, version, self.flags, self.num_docs, self.num_terms, self.num_postings, self.avg_doc_len,
+         term_table_offset, term_blob_offset, docno_table_offset, _,
+         doc_lens_offset, self.impact_bits, impact_scale) = struct.unpack_from(HEADER_FORMAT, self.buffer)  # Older headers are zero padded, so they read as not quantised
+        if magic != MAGIC or version not in SUPPORTED_VERSIONS:
+            raise ValueError(f"{file_path} is not a version {VERSION} BM25 binary index.")
+        self.term_table_offset = term_table_offset
+        self.term_blob = self.buffer[term_blob_offset:term_blob_offset + (docno_table_offset - term_blob_offset)]
+        docno_blob_offset = docno_table_offset + 4 * (self.num_docs + 1)
+        self.docnos = DocnoTable(self.buffer[docno_table_offset:docno_blob_offset].cast('I'), self.buffer[docno_blob_offset:])
+        self.version = version
+        self.raw_tf = bool(self.flags & FLAG_RAW_TF)
+        self.compressed = bool(self.flags & FLAG_COMPRESSED)
+        self.term_scale = bool(self.flags & FLAG_TERM_SCALE)
+        self.max_code = (1 << self.impact_bits) - 1
+        self.postings_format = 'I' if self.raw_tf else CODE_TYPECODES[self.impact_bits] if self.impact_bits else 'f'
+        # Engines add up the stored impacts; with globally quantised impacts these are integer codes, and the final
+        # scores are multiplied by score_scale. Per-term codes stay codes and come with the scale of their term.
+        self.score_scale = impact_scale if self.impact_bits and not self.term_scale else 1
+        self.doc_lens = None  # Document lengths, only stored in raw term frequency indexes
+        if doc_lens_offset:
+            self.doc_lens = self.buffer[doc_lens_offset:doc_lens_offset + 4 * self.num_docs].cast('I')
+
+    def snapshot(self):
+        """The file is immutable once written, so the reader is its own consistent snapshot."""
+        return self
+
+    def term_record(self, i):
+        """Return the i-th record of the term table: (term blob offset, term length, postings offset, df, max impact)."""
+        return struct.unpack_from(TERM_RECORD_FORMAT, self.buffer, self.term_table_offset + i * TERM_RECORD_SIZE)
+
+    def find_term_index(self, term):
+        """Binary search the sorted term table, return the position of the term or None if the term is not indexed."""
+        key = term.encode('utf-8')
+        low, high = 0, self.num_terms - 1
+        while low <= high:
+            mid = (low + high) // 2
+            record = self.term_record(mid)
+            current = self.term_blob[record[0]:record[0] + record[1]]
+            if current == key:
+                return mid
+            if bytes(current) < key:
+                low = mid + 1
+            else:
+                high = mid - 1
+        return None
+
+    def find_term(self, term):
+        """Return the term record of a term or None if the term is not indexed."""
+        i = self.find_term_index(term)
+        return None if i is None else self.term_record(i)
+
+    def prefetch(self, term):
+        """Read the postings of a term into the page cache ahead of their first use. Where madvise is available the kernel reads them in the background, otherwise every page is touched. Returns False if the term is not indexed."""
+        i = self.find_term_index(term)
+        if i is None:
+            return False
+        # Postings are written in term order, so the postings of a term end where the next term's begin
+        start = self.term_record(i)[2]
+        end = self.term_record(i + 1)[2] if i + 1 < self.num_terms else self.term_table_offset
+        if self.mm is not None and hasattr(mmap, 'MADV_WILLNEED'):
+            aligned_start = start - start % mmap.PAGESIZE
+            self.mm.madvise(mmap.MADV_WILLNEED, aligned_start, end - aligned_start)
+        else:
+            sum(self.buffer[start:end:mmap.PAGESIZE])
+        return True
+
+    def postings(self, term):
+        """Return zero-copy views (doc ids, impacts, scale) over the postings of a term, or None if the term is not indexed. The score of a posting is impact * scale; the scale is 1 unless the codes are quantised with one scale per term."""
+        record = self.find_term(term)
+        if record is None:
+            return None
+        return self.record_postings(record)
+
+    def decode_doc_ids(self, postings_offset, df):
+        """Decode the packed gaps of a compressed postings list. Returns (doc ids, offset of the impacts)."""
+        num_blocks = -(-df // BLOCK_SIZE)
+        widths = bytes(self.buffer[postings_offset:postings_offset + num_blocks])
+        gaps = []
+        position = postings_offset + num_blocks
+        block = 0
+        while block < num_blocks:
+            # Consecutive blocks of the same width are decoded together, one C level copy per run of blocks
+            width = widths[block]
+            run_end = block + 1
+            while run_end < num_blocks and widths[run_end] == width:
+                run_end += 1
+            end = position + width * (min(run_end * BLOCK_SIZE, df) - block * BLOCK_SIZE)
+            gaps += self.buffer[position:end].cast(GAP_TYPECODES[width]).tolist()
+            position = end
+            block = run_end
+        return list(accumulate(gaps)), position + (-(position - postings_offset) % 4)
+
+    def read_postings(self, record, packed=False):
+        """Return (doc ids, impacts or raw term frequencies, offset of the block maxima) of a term record. Impacts are zero-copy views (quantised codes stay codes); doc ids are views too unless they have to be decoded, or PackedDocIds with packed."""
+        _, _, postings_offset, df, max_impact = record
+        if self.compressed and packed:
+            doc_ids = PackedDocIds(self.buffer, postings_offset, df)
+            impacts_offset = doc_ids.end
+        elif self.compressed:
+            doc_ids, impacts_offset = self.decode_doc_ids(postings_offset, df)
+        else:
+            doc_ids, impacts_offset = self.buffer[postings_offset:postings_offset + 4 * df].cast('I'), postings_offset + 4 * df
+        impacts_size = struct.calcsize(self.postings_format) * df
+        impacts = self.buffer[impacts_offset:impacts_offset + impacts_size].cast(self.postings_format)
+        return doc_ids, impacts, impacts_offset + impacts_size + (-impacts_size % 4)
+
+    def record_scale(self, record):
+        """Return the scale turning the stored impacts of a term record into scores: max impact / max code with per-term quantisation, 1 otherwise."""
+        return record[4] / self.max_code if self.term_scale else 1
+
+    def record_postings(self, record):
+        """Return (doc ids, impacts or raw term frequencies, scale) of a term record."""
+        return self.read_postings(record)[:2] + (self.record_scale(record),)
+
+    def postings_with_bounds(self, term):
+        """Return (doc ids, impacts, max impact, block maxima, scale) of a term for dynamic pruning, or None if the term is not indexed. The bounds are in the units of the stored impacts, like the impacts they are multiplied by scale."""
+        record = self.find_term(term)
+        if record is None:
+            return None
+        return self.record_postings_with_bounds(record)
+
+    def record_postings_with_bounds(self, record):
+        """Return (doc ids, impacts, max impact, block maxima, scale) of a term record. Compressed doc ids are returned as PackedDocIds and only decoded block by block as a query cursor reaches them."""
+        df, max_impact = record[3:]
+        num_blocks = -(-df // BLOCK_SIZE)
+        # Older files have no table of block last doc ids, their doc ids are decoded up front
+        doc_ids, impacts, blocks_offset = self.read_postings(record, packed=self.version >= 6)
+        block_maxima = self.buffer[blocks_offset:blocks_offset + 4 * num_blocks].cast('f')
+        if isinstance(doc_ids, PackedDocIds):
+            doc_ids.block_last_docs = self.buffer[blocks_offset + 4 * num_blocks:blocks_offset + 8 * num_blocks].cast('I')
+        if self.term_scale:  # The record holds the real max impact, the largest code bounds the codes
+            max_impact = self.max_code
+        return doc_ids, impacts, max_impact, block_maxima, self.record_scale(record)
+
+    def iter_terms(self):
+        """Yield (term, doc ids, impacts, scale) for every term in sorted term order."""
+        for i in range(self.num_terms):
+            record = self.term_record(i)
+            yield (self.record_term(record),) + self.record_postings(record)
+
+    def record_term(self, record):
+        """Return the term of a term record."""
+        return str(self.term_blob[record[0]:record[0] + record[1]], 'utf-8')
+
+    def docno(self, doc_id):
+        """Translate an integer doc id back to its document name."""
+        return self.docnos[doc_id]
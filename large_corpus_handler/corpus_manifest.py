@@ -0,0 +1,58 @@
+"""
+Student ID: 21207500
+Student Name: Liyan Tao
+"""
+
+import os
+import json
+import hashlib
+
+MANIFEST_FILE = 'corpus_manifest.json'
+
+
+def hash_file(file_path):
+    """Compute the SHA-1 of a file's content"""
+    digest = hashlib.sha1()
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class CorpusManifest:
+    def __init__(self, manifest_file_path):
+        self.manifest_file_path = manifest_file_path
+        self.entries = {}  # { relative path: [size, mtime_ns, sha1], ... } of every indexed document file
+        if os.path.exists(manifest_file_path):
+            with open(manifest_file_path, 'r', encoding='utf-8') as file:
+                self.entries = json.load(file)
+
+    def scan(self, documents_dir_path):
+        """Compare the documents directory with the manifest. Returns (paths of added or changed files, names of removed documents, new manifest entries). Only files whose size or mtime changed are hashed."""
+        changed_paths = []
+        entries = {}
+        for subdir in os.scandir(documents_dir_path):  # scandir reuses the directory entries, no extra stat for the type
+            if not subdir.is_dir():
+                continue
+            for file in os.scandir(subdir.path):
+                if not file.name.startswith("GX"):
+                    continue
+                relative_path = subdir.name + '/' + file.name
+                stat = file.stat()
+                old_entry = self.entries.get(relative_path)
+                if old_entry is not None and old_entry[0] == stat.st_size and old_entry[1] == stat.st_mtime_ns:
+                    entries[relative_path] = old_entry  # Unchanged, not even read
+                    continue
+                content_hash = hash_file(file.path)
+                entries[relative_path] = [stat.st_size, stat.st_mtime_ns, content_hash]
+                if old_entry is None or old_entry[2] != content_hash:  # Touched files with the same content are not re-indexed
+                    changed_paths.append(file.path)
+        removed_docnos = [relative_path.split('/')[-1] for relative_path in self.entries if relative_path not in entries]
+        return changed_paths, removed_docnos, entries
+
+    def save(self, entries):
+        """Replace the manifest atomically with the new entries"""
+        self.entries = entries
+        with open(self.manifest_file_path + '.tmp', 'w', encoding='utf-8') as file:
+            json.dump(entries, file)
+        os.replace(self.manifest_file_path + '.tmp', self.manifest_file_path)
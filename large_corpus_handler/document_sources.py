@@ -0,0 +1,63 @@
+"""
+Student ID: 21207500
+Student Name: Liyan Tao
+"""
+
+import os
+import gzip
+import tarfile
+import zipfile
+
+
+def is_document(name):
+    """Only GX files are documents, as in the documents directory; the file name is the document name."""
+    return os.path.basename(name).startswith("GX")
+
+
+def iter_tar_documents(archive_path):
+    """Yield (docno, bytes) for the GX files of a tar archive (optionally gzip, bz2 or xz compressed), streamed member by member without extracting anything."""
+    with tarfile.open(archive_path, 'r|*') as archive:
+        for member in archive:
+            if member.isfile() and is_document(member.name):
+                yield os.path.basename(member.name), archive.extractfile(member).read()
+
+
+def iter_zip_documents(archive_path):
+    """Yield (docno, bytes) for the GX files of a zip archive, in archive order."""
+    with zipfile.ZipFile(archive_path) as archive:
+        for info in archive.infolist():
+            if not info.is_dir() and is_document(info.filename):
+                yield os.path.basename(info.filename), archive.read(info)
+
+
+def iter_trec_documents(file_path):
+    """Yield (docno, bytes) for the GX documents of a TREC-style file (optionally gzip compressed): documents are concatenated as <DOC>, a <DOCNO> line, the text, then </DOC>."""
+    opener = gzip.open if file_path.endswith('.gz') else open
+    with opener(file_path, 'rb') as file:
+        docno, lines = None, None
+        for line in file:
+            stripped = line.strip()
+            if stripped == b'<DOC>':
+                docno, lines = None, []
+            elif stripped == b'</DOC>':
+                if docno is not None and is_document(docno):
+                    yield docno, b''.join(lines)
+                docno, lines = None, None
+            elif lines is not None:
+                if docno is None and stripped.startswith(b'<DOCNO>'):
+                    if b'</DOCNO>' not in stripped:  # Skip the rest of the document rather than abort the whole run
+                        print(f"Skipping a document of {file_path}, its DOCNO line is not closed: {stripped.decode('utf-8', 'replace')}")
+                        lines = None
+                        continue
+                    docno = stripped[len(b'<DOCNO>'):stripped.index(b'</DOCNO>')].strip().decode('utf-8')
+                else:
+                    lines.append(line)
+
+
+def iter_archive_documents(archive_path):
+    """Yield (docno, bytes) for every document of a tar, tar.gz, zip or TREC-style file, in the order they are stored."""
+    if zipfile.is_zipfile(archive_path):
+        return iter_zip_documents(archive_path)
+    if tarfile.is_tarfile(archive_path):
+        return iter_tar_documents(archive_path)
+    return iter_trec_documents(archive_path)
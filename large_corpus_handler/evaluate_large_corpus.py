@@ -198,21 +198,33 @@ class Estimator:
             bprefs = bprefs + bpref
         return bprefs / len(retrieved)
 
-    def evaluate(self):
-        """Print the evaluation results"""
+    def metrics(self):
+        """Compute all evaluation metrics, returns [(name, value), ...]"""
+        return [("Precision:", self.precision(self.ret, self.rel)),
+                ("Recall:", self.recall(self.ret, self.rel)),
+                ("R-precision:", self.r_precision(self.ret, self.rel)),
+                ("P@15:", self.precision_at_10(self.ret, self.rel)),
+                ("MAP:", self.map(self.ret, self.rel)),
+                ("NDCG@15", self.ndcg_at_n(self.ret, self.rel, 15)),
+                ("bpref10:", self.bpref10(self.ret, self.rel))]
+
+    def evaluate(self, baseline=None):
+        """Print the evaluation results. With a baseline Estimator (e.g. the results of an unquantised index), print both side by side with the change"""
         print("Evaluation results:")
-        print(f"Precision:    {self.precision(self.ret, self.rel):.3f}")
-        print(f"Recall:       {self.recall(self.ret, self.rel):.3f}")
-        print(f"R-precision:  {self.r_precision(self.ret, self.rel):.3f}")
-        print(f"P@15:         {self.precision_at_10(self.ret, self.rel):.3f}")
-        print(f"MAP:          {self.map(self.ret, self.rel):.3f}")
-        print(f"NDCG@15       {self.ndcg_at_n(self.ret, self.rel, 15):.3f}")
-        print(f"bpref10:      {self.bpref10(self.ret, self.rel):.3f}")
+        if baseline is None:
+            for name, value in self.metrics():
+                print(f"{name:<14}{value:.3f}")
+            return
+        print(f"{'':<14}{'Baseline':>10}{'Results':>10}{'Change':>10}")
+        for (name, value), (_, baseline_value) in zip(self.metrics(), baseline.metrics()):
+            print(f"{name:<14}{baseline_value:>10.3f}{value:>10.3f}{value - baseline_value:>+10.3f}")
 
 
 def main():
     parser = argparse.ArgumentParser(description="Evaluate search results.")
     parser.add_argument('-p', '--path', required=True, help='Path to the large corpus.')
+    parser.add_argument('-c', '--compare', default=None,
+                        help='Results file of a baseline run (e.g. before quantising the index) to compare the results with.')
     args = parser.parse_args()
 
     qrels_file_path = os.path.join(args.path, 'files', 'qrels.txt')
@@ -225,7 +237,8 @@ def main():
         print("Results file not found. You should run the query_large_corpus.py script under large_corpus_handler folder.")
 
     evaluator = Estimator(qrels_file_path, results_file_path)
-    evaluator.evaluate()
+    baseline = Estimator(qrels_file_path, args.compare) if args.compare is not None else None
+    evaluator.evaluate(baseline)
 
 
 if __name__ == "__main__":
@@ -5,34 +5,93 @@ Student Name: Liyan Tao
 
 import os
 import math
-import json
 import time
-from files import porter
+from stemmer import StemTable, STEM_TABLE_FILE
+from analyzer import Analyzer
+from prefetch_reader import PrefetchingReader
+from document_sources import iter_archive_documents
+from binary_index import BinaryIndexWriter, DocnoTable
 import argparse
+import multiprocessing
+import tempfile
+import pickle
+import heapq
+from array import array
+from collections import deque
+from itertools import islice
+
+ARCHIVE_GROUP_SIZE = 1000  # Documents of an archive sent to one preprocessing task
+POSTING_MEMORY_ESTIMATE = 100  # Rough number of bytes one in-memory posting costs (dict slot, doc id and term frequency objects)
+worker_processor = None  # Copy of the DocumentProcessor owned by a preprocessing worker process
+
+
+def init_worker(processor):
+    """Give a preprocessing worker process its own copy of the processor, so it keeps its own stopwords and stem cache"""
+    global worker_processor
+    worker_processor = processor
+
+
+def process_files_in_worker(task):
+    """Preprocess one group of documents (first doc id, file paths) in a worker process and send the partial statistics back to the parent"""
+    return worker_processor.process_files(*task)
+
+
+def process_contents_in_worker(task):
+    """Preprocess one group of documents read from an archive (list of (docno, bytes), first doc id) in a worker process"""
+    return worker_processor.process_contents(*task)
+
+
+def read_run(run_file_path):
+    """Yield the (term, postings) records of a run file in the order they were written"""
+    with open(run_file_path, 'rb') as file:
+        while True:
+            try:
+                yield pickle.load(file)
+            except EOFError:
+                return
 
 
 class DocumentProcessor:
-    def __init__(self, documents_dir_path, stopwords_file_path='large_corpus_handler/files/stopwords.txt'):
+    def __init__(self, documents_dir_path, stopwords_file_path='large_corpus_handler/files/stopwords.txt', workers=1, memory_budget=None, temp_dir=None, file_paths=None, stem_table_path=None, readers=4, queue_depth=64):
         self.documents_dir_path = documents_dir_path
+        self.file_paths = file_paths  # Only process these document files instead of every GX file under documents_dir_path
         self.stopwords_file_path = stopwords_file_path
-        self.documents = {}
+        self.workers = workers  # Number of preprocessing processes, 1 processes the documents in this process
+        self.memory_budget = memory_budget  # Megabytes of in-memory postings before a block is flushed to a run file, None keeps the whole index in memory
+        self.temp_dir = temp_dir  # Directory of the run files, None uses the system temporary directory
+        self.readers = readers  # Threads reading document files ahead of the analysis, 0 reads them synchronously
+        self.queue_depth = queue_depth  # Maximum number of files read ahead
+        self.io_wait = 0  # Seconds the analysis waited for file reads, summed over the worker processes
+        self.read_time = 0  # Seconds spent reading files by the reader threads
+        self.analysis_time = 0  # Seconds spent analysing and counting the terms of the documents
+        self.postings = {}  # Raw term frequencies of the current block as an inverted index: { term: { doc_id: f_ij, ... }, ... }
+        self.block_postings_num = 0  # Number of postings in the current block
+        self.run_files = []  # Sorted runs flushed to disk, in document order
+        self.docnos = DocnoTable()  # Name of each document by integer doc id, ids are assigned in processing order
+        self.doc_lens = array('I')  # Length of each document by doc id
         self.stopwords = set()
-        self.stemmer = porter.PorterStemmer()
-        self.stemmer_accelerator = {}
+        self.stems = StemTable(stem_table_path, track_added=True)  # Stems of the words seen, loaded from and saved back to the table next to the index
         self.docs_num = 0  # Total number of documents
         self.total_doc_len = 0  # Total document length for calculating average length
         self.avg_doc_len = 0  # Average document length
         self.load_stopwords()
+        self.analyzer = Analyzer(self.stopwords, self.stems)  # Shared with the query side, so documents and queries give the same terms
         self.process_documents()
 
-    def count_valid_files_number(self, directory):
-        """Count the number of files starting with 'GX' in the directory and its subdirectories"""
-        total_files = 0
-        for subdir, dirs, files in os.walk(directory):
-            for file in files:
-                if file.startswith("GX"):
-                    total_files += 1
-        return total_files
+    def list_document_groups(self):
+        """List the document files to process grouped by subdirectory, one group is one preprocessing task"""
+        groups = []
+        if self.file_paths is not None:
+            subdir_groups = {}
+            for file_path in self.file_paths:
+                subdir_groups.setdefault(os.path.dirname(file_path), []).append(file_path)
+            return list(subdir_groups.values())
+        for subdir in os.listdir(self.documents_dir_path):  # Traverse all subdirectories in the documents directory
+            subdir_path = os.path.join(self.documents_dir_path, subdir)
+            if os.path.isdir(subdir_path):
+                # Traverse files in subdirectories (e.g., GX000, GX001...) and ensure the file starts with 'GX'
+                groups.append([os.path.join(subdir_path, filename) for filename in os.listdir(subdir_path) if filename.startswith("GX")])
+        return groups
 
     def load_stopwords(self):
         """Load stopwords list from file"""
@@ -40,151 +99,251 @@ class DocumentProcessor:
             for line in file:
                 self.stopwords.add(line.strip())
 
+    def process_files(self, file_paths, first_doc_id=0):
+        """Process a group of documents (e.g., the files of one GX subdirectory) whose doc ids start at first_doc_id and return their partial term statistics: (postings, docnos, doc_lens, total_doc_len, new stems, (io wait, read time, analysis time)). Each document is reduced to term counts as soon as it is read, so its token list is dropped right away. Reader threads read the next files while a document is analysed."""
+        reader = PrefetchingReader(self.readers, self.queue_depth)
+        documents = ((os.path.basename(file_path), data) for file_path, data in reader.read_files(file_paths))  # The file name is the document name
+        return self.process_contents(documents, first_doc_id, reader)
+
+    def process_contents(self, documents, first_doc_id=0, reader=None):
+        """Process the raw content of a group of documents, given as (docno, bytes) in doc id order from first_doc_id, and return their partial term statistics as process_files() does. reader is the PrefetchingReader the contents come from, if any."""
+        postings = {}
+        docnos = DocnoTable()
+        doc_lens = array('I')
+        total_doc_len = 0
+        analysis_time = 0
+        for doc_id, (docno, data) in enumerate(documents, start=first_doc_id):
+            start = time.time()
+            docnos.append(docno)
+            tokens = self.analyzer.analyze_bytes(data)  # Convert to lowercase, remove punctuation, split into terms, remove stopwords and perform stemming
+            doc_lens.append(len(tokens))
+            total_doc_len += len(tokens)  # Accumulate the length of the current document
+            counts = {}
+            for term in tokens:
+                counts[term] = counts.get(term, 0) + 1
+            for term, f_ij in counts.items():
+                if term not in postings:
+                    postings[term] = {}
+                postings[term][doc_id] = f_ij
+            analysis_time += time.time() - start
+        io_wait, read_time = (reader.io_wait, reader.read_time) if reader is not None else (0, 0)
+        return postings, docnos, doc_lens, total_doc_len, self.stems.take_added(), (io_wait, read_time, analysis_time)
+
+    def merge_partial_statistics(self, partial):
+        """Merge the term statistics of one processed group of documents into the collection"""
+        postings, docnos, doc_lens, total_doc_len, new_stems, (io_wait, read_time, analysis_time) = partial
+        self.stems.merge(new_stems)  # Words first stemmed by a worker process
+        self.io_wait += io_wait
+        self.read_time += read_time
+        self.analysis_time += analysis_time
+        for term, term_postings in postings.items():
+            if term not in self.postings:
+                self.postings[term] = term_postings
+            else:
+                self.postings[term].update(term_postings)  # Appended after the documents of the previous subdirectories
+        self.docnos.extend(docnos)
+        self.doc_lens.extend(doc_lens)
+        self.docs_num += len(doc_lens)  # Update the total number of documents
+        self.total_doc_len += total_doc_len
+        self.block_postings_num += sum(len(term_postings) for term_postings in postings.values())
+        if self.memory_budget is not None and self.block_postings_num * POSTING_MEMORY_ESTIMATE > self.memory_budget * 1024 * 1024:
+            self.flush_run()
+
+    def flush_run(self):
+        """Write the postings of the current block to a temporary run file sorted by term, then start a new empty block"""
+        with tempfile.NamedTemporaryFile('wb', prefix='bm25-', suffix='.run', dir=self.temp_dir, delete=False) as run_file:
+            for term in sorted(self.postings):
+                pickle.dump((term, self.postings[term]), run_file, pickle.HIGHEST_PROTOCOL)
+        self.run_files.append(run_file.name)
+        print(f"Flushed run {len(self.run_files)} with {self.block_postings_num} postings to {run_file.name}")
+        self.postings = {}
+        self.block_postings_num = 0
+
+    def iter_postings(self, keep_runs=False):
+        """Yield (term, raw postings) in sorted term order. Run files are k-way merged with the block still in memory; runs were written in document order and the merge is stable, so the postings of a term stay in document order. Run files are removed afterwards unless keep_runs is set for another pass."""
+        memory_run = ((term, self.postings[term]) for term in sorted(self.postings))
+        if not self.run_files:
+            yield from memory_run
+            return
+        print(f"Merging {len(self.run_files)} run files with the in-memory block...")
+        runs = [read_run(run_file_path) for run_file_path in self.run_files] + [memory_run]
+        current_term, current_postings = None, None
+        try:
+            for term, term_postings in heapq.merge(*runs, key=lambda record: record[0]):
+                if term == current_term:
+                    current_postings.update(term_postings)
+                else:
+                    if current_term is not None:
+                        yield current_term, current_postings
+                    current_term, current_postings = term, term_postings
+            if current_term is not None:
+                yield current_term, current_postings
+        finally:
+            for run in runs:
+                run.close()
+            if keep_runs:
+                return
+            for run_file_path in self.run_files:
+                os.remove(run_file_path)
+            self.run_files = []
+
+    def archive_tasks(self):
+        """Read the documents of an archive in this process and yield them as tasks (list of (docno, bytes), first doc id) of ARCHIVE_GROUP_SIZE documents"""
+        documents = iter_archive_documents(self.documents_dir_path)
+        first_doc_id = 0
+        while True:
+            start = time.time()
+            group = list(islice(documents, ARCHIVE_GROUP_SIZE))
+            self.io_wait += time.time() - start  # Reading and decompressing the archive holds up this process
+            self.read_time += time.time() - start
+            if not group:
+                return
+            yield group, first_doc_id
+            first_doc_id += len(group)
+
     def process_documents(self):
-        """Execute the complete document processing workflow: reading, removing stopwords, and stemming"""
+        """Execute the complete document processing workflow: reading, removing stopwords, and stemming. With several workers, the subdirectories are spread over a process pool. The documents path may also be a tar, tar.gz or zip archive or a TREC-style file, whose documents are read without extracting them."""
         print("Start documents preprocessing, please wait...")
         start = time.time()
-        total_files = self.count_valid_files_number(self.documents_dir_path)
-        for subdir in os.listdir(self.documents_dir_path):  # Traverse all subdirectories in the documents directory
-            subdir_path = os.path.join(self.documents_dir_path, subdir)
-            if os.path.isdir(subdir_path):
-                for filename in os.listdir(subdir_path):  # Traverse files in subdirectories (e.g., GX000, GX001...)
-                    if filename.startswith("GX"):  # Ensure the file starts with 'GX'
-                        file_path = os.path.join(subdir_path, filename)
-                        with open(file_path, 'r', encoding='UTF-8') as file:
-                            text = file.read().lower()
-                            text = text.translate(str.maketrans('', '', '!"#$%&\'()*+,-./:;<=>?@[\\]^_`{|}~'))  # Remove punctuation
-                            tokens = text.split()
-                            tokens = self.remove_stopwords(tokens)  # Remove stopwords
-                            tokens = self.stem_words(tokens)  # Perform stemming
-                            self.documents[filename] = tokens
-                            self.docs_num += 1  # Update the total number of documents
-                            self.total_doc_len += len(tokens)  # Accumulate the length of the current document
-                        if self.docs_num % 100 == 0 or self.docs_num == total_files:
-                            print(f"Processing documents {self.docs_num}/{total_files}")
+        readers = f"{self.readers} reader threads" if self.readers > 0 else "read synchronously"
+        if os.path.isfile(self.documents_dir_path):
+            tasks = self.archive_tasks()
+            total_files = "?"  # Only known once the whole archive is read
+            readers = "read from the archive"
+            process, worker_function = self.process_contents, process_contents_in_worker
+        else:
+            groups = self.list_document_groups()
+            total_files = sum(len(group) for group in groups)
+            # Every file is one document, so the doc ids of each group are known before any group is processed
+            tasks = []
+            first_doc_id = 0
+            for group in groups:
+                tasks.append((group, first_doc_id))
+                first_doc_id += len(group)
+            process, worker_function = self.process_files, process_files_in_worker
+        if self.workers > 1:
+            with multiprocessing.Pool(self.workers, initializer=init_worker, initargs=(self,)) as pool:
+                # Results are merged in submission order, so documents keep the same order as a sequential run. At most two
+                # tasks per worker are queued, so the documents of an archive are not all read into memory ahead of the workers
+                pending = deque()
+                for task in tasks:
+                    pending.append(pool.apply_async(worker_function, (task,)))
+                    if len(pending) > 2 * self.workers:
+                        self.merge_partial_statistics(pending.popleft().get())
+                        print(f"Processing documents {self.docs_num}/{total_files}")
+                while pending:
+                    self.merge_partial_statistics(pending.popleft().get())
+                    print(f"Processing documents {self.docs_num}/{total_files}")
+        else:
+            for task in tasks:
+                self.merge_partial_statistics(process(*task))
+                print(f"Processing documents {self.docs_num}/{total_files}")
         # After processing all documents, calculate the average document length
         if self.docs_num > 0:
             self.avg_doc_len = self.total_doc_len / self.docs_num
+        self.stems.save()
         end = time.time()
+        print(f"Waiting on I/O: {self.io_wait:.2f} seconds, analysis (CPU): {self.analysis_time:.2f} seconds, "
+              f"file reads: {self.read_time:.2f} seconds ({readers}).")
         print(f"Document processing completed in {end - start:.2f} seconds.\n")
 
-    def remove_stopwords(self, tokens):
-        """Remove stopwords from the given list of terms."""
-        return [term for term in tokens if term not in self.stopwords]
-
-    def stem_words(self, tokens):
-        """Perform stemming on the given list of terms. Use a stemmer accelerator to speed up the stemming process."""
-        stemmed_tokens = []
-        for term in tokens:
-            if term in self.stemmer_accelerator:
-                stemmed_tokens.append(self.stemmer_accelerator[term])
-            else:
-                stemmed_term = self.stemmer.stem(term)
-                self.stemmer_accelerator[term] = stemmed_term
-                stemmed_tokens.append(stemmed_term)
-        return stemmed_tokens
-
 
 class BM25Index:
     def __init__(self, document_processor, k=1, b=0.75):
         self.idf = {}
-        self.tf = {}
-        self.bm25_scores = {}
+        self.norms = []  # Length normalisation of each document by doc id: k * (1 - b + b * len_j / avg_len)
         self.processor = document_processor
         self.k = k
         self.b = b
         self.get_document_score()
 
-    def compute_terms_idf(self):
-        """Compute the IDF of each term, idf_i = log2( (N-n_i+0.5) / (n_i+0.5) + 1) : N is the total number of documents, n_i is the number of documents containing term i"""
-        print("Computing terms IDF values...")
-        documents = self.processor.documents
-        idf = {}  # Store the number of documents each term appears in the document collection
-        for i, doc in enumerate(documents):  # doc is the key of the document
-            for term in set(documents[doc]):
-                if term not in idf:
-                    idf[term] = 1
-                else:
-                    idf[term] += 1
-            if (i + 1) % 1000 == 0 or i + 1 == self.processor.docs_num:
-                print(f"Computing terms IDF values for documents {i + 1}/{self.processor.docs_num}")
-        for term in idf:
-            idf[term] = math.log2(1 + (self.processor.docs_num - idf[term] + 0.5) / (idf[term] + 0.5))
-        return idf
-
-    def compute_documents_tf(self):
-        """Compute the TF value of each term in the document collection"""
-        print("Computing documents TF values...")
-        documents = self.processor.documents
-        tf = {}  # Store the TF value of each term in each document: {doc1: {term1: tf1, term2: tf2, ...}, doc2: {term1: tf1, term2: tf2, ...}, ...}
-        for i, doc in enumerate(documents):
-            tf[doc] = {}  # tf = { doc1: { term1 : num, term2 : num, ... }, doc2: { term1 : num, term2 : num, ... }, ... }
-            for term in documents[doc]:  # Traverse all terms in the document with key doc
-                if term not in tf[doc]:
-                    tf[doc][term] = 1
-                else:
-                    tf[doc][term] += 1
-            # Calculate the TF value of each term in the current document
-            for term in tf[doc]:
-                f_ij = tf[doc][term]
-                tf[doc][term] = (f_ij * (1 + self.k)) / (f_ij + self.k * (1 - self.b + self.b * len(documents[doc]) / self.processor.avg_doc_len))
-            if (i + 1) % 1000 == 0 or i + 1 == self.processor.docs_num:
-                print(f"Computing documents TF values for documents {i + 1}/{self.processor.docs_num}")
-        # print("Documents TF values: " + str(tf) + "\n")
-        # The TF of each document in the document collection after calculation is as follows:
-        # {'GX000-01-10544170': {'static': 1.0586916337295802, 'aerodynam': 1.542763787034428, 'characterist': 1.542763787034428, 'short': 1.3845026050418516, 'blunt': 1.3845026050418516, 'cone': 1.799952348010274, 'variou': 1.0586916337295802, 'nose': 1.7418759813234317, 'base': 1.820181404463512, 'angl': 1.799952348010274, 'mach': 1.3845026050418516, 'number': 1.542763787034428, '0': 1.3845026050418516, '6': 1.0586916337295802, '5': 1.3845026050418516, 'attack': 1.3845026050418516, '180': 1.542763787034428, 'windtunnel': 1.0586916337295802, 'test': 1.542763787034428, 'perform': 1.0586916337295802, '06': 1.0586916337295802, '55': 1.0586916337295802, 'determin': 1.0586916337295802, 'coeffici': 1.0586916337295802, 'normal': 1.0586916337295802, 'forc': 1.3845026050418516, 'axial': 1.0586916337295802, 'pitch': 1.0586916337295802, 'moment': 1.0586916337295802, 'affect': 1.0586916337295802, 'chang': 1.542763787034428, 'model': 1.6980453523003483, 'halfangl': 1.7745949513495383, '10': 1.3845026050418516, '20': 1.3845026050418516, 'investig': 1.0586916337295802, 'flat': 1.3845026050418516, '50': 1.542763787034428, '70': 1.3845026050418516, 'reynold': 1.0586916337295802, 'rang': 1.0586916337295802, 'maximum': 1.0586916337295802, 'diamet': 1.0586916337295802, 'variat': 1.3845026050418516, 'result': 1.542763787034428, 'signific': 1.0586916337295802, 'lesser': 1.0586916337295802, 'effect': 1.0586916337295802, 'particular': 1.0586916337295802, 'conic': 1.3845026050418516, 'on': 1.0586916337295802, 'trim': 1.542763787034428, 'two': 1.0586916337295802, 'estim': 1.0586916337295802, 'mean': 1.0586916337295802, 'modifi': 1.0586916337295802, 'newtonian': 1.0586916337295802, 'theori': 1.3845026050418516, 'good': 1.0586916337295802, 'agreement': 1.0586916337295802, 'experiment': 1.0586916337295802, 'fail': 1.0586916337295802, 'predict': 1.0586916337295802, 'point': 1.0586916337295802, 'flatbas': 1.0586916337295802}, ...}
-        return tf
-
-    def compute_bm25_scores(self):
-        """Compute the BM25 score of each document in the document collection"""
-        print("Computing BM25 scores...")
-        documents = self.processor.documents
-        scores = {}
-        for i, doc in enumerate(documents):
-            # scores = { doc1: { term1 : score, term2 : score, ... }, doc2: { term1 : score, term2 : score, ... }, ... }
-            scores[doc] = {}
-            for term in documents[doc]:
-                if term not in self.idf:
-                    scores[doc][term] = 0
-                else:
-                    scores[doc][term] = self.idf[term] * self.tf[doc][term]
-            if (i + 1) % 1000 == 0 or i + 1 == self.processor.docs_num:
-                print(f"Computing BM25 scores for documents {i + 1}/{self.processor.docs_num}")
-        # print("Documents BM25 scores: " + str(scores) + "\n")
-        return scores
+    def compute_term_idf(self, n_i):
+        """Compute the IDF of a term, idf_i = log2( (N-n_i+0.5) / (n_i+0.5) + 1) : N is the total number of documents, n_i is the number of documents containing term i"""
+        return math.log2(1 + (self.processor.docs_num - n_i + 0.5) / (n_i + 0.5))
+
+    def compute_length_norms(self):
+        """The length normalisation of BM25 only depends on the document, compute it once per document"""
+        if self.processor.avg_doc_len == 0:  # Every document is empty or only stopwords, there are no postings to score
+            return [self.k] * len(self.processor.doc_lens)
+        return [self.k * (1 - self.b + self.b * doc_len / self.processor.avg_doc_len) for doc_len in self.processor.doc_lens]
+
+    def compute_bm25_scores(self, term, term_postings):
+        """Turn the raw term frequencies of one term into BM25 scores in place, score = idf_i * (f_ij * (1 + k)) / (f_ij + k * (1 - b + b * len_j / avg_len)), so no second copy of the postings is built"""
+        idf = self.compute_term_idf(len(term_postings))  # One posting per document containing the term
+        self.idf[term] = idf
+        for doc_id, f_ij in term_postings.items():
+            term_postings[doc_id] = idf * ((f_ij * (1 + self.k)) / (f_ij + self.norms[doc_id]))
+        return term_postings
 
     def get_document_score(self):
-        """First compute TF and IDF, then compute BM25 scores of each document"""
+        """Finalise the collection statistics. IDF and the BM25 scores of each term are derived from them while the (possibly merged) postings are exported."""
         print("Start computing BM25 scores, please wait...")
         start = time.time()
-        self.idf = self.compute_terms_idf()
-        self.tf = self.compute_documents_tf()
-        self.bm25_scores = self.compute_bm25_scores()
+        self.norms = self.compute_length_norms()
         end = time.time()
-        print(f"BM25 scores computed in {end - start:.2f} seconds.\n")
-
-    def export_to_json(self, output_dir):
-        """Export BM25 scores to a JSON file"""
-        print("Exporting BM25 scores to JSON file...")
-        file_path = os.path.join(output_dir, '21207500-large.index.json')
-        if self.bm25_scores.keys():
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(self.bm25_scores, f, ensure_ascii=False, indent=4)
-        else:
-            print("No BM25 scores to export.")
+        print(f"Document length normalisation computed in {end - start:.2f} seconds.\n")
+
+    def max_impact(self):
+        """Largest BM25 impact of the index, found in a pass over the raw postings before they are exported. A term is only scanned if the bound idf * (1 + k) of its impacts can beat the largest impact found so far, so the long postings lists of frequent terms are skipped"""
+        print("Finding the largest BM25 impact for the quantisation scale...")
+        start = time.time()
+        largest = 0
+        for term, term_postings in self.processor.iter_postings(keep_runs=True):
+            idf = self.compute_term_idf(len(term_postings))
+            if idf * (1 + self.k) <= largest:
+                continue
+            for doc_id, f_ij in term_postings.items():
+                impact = idf * ((f_ij * (1 + self.k)) / (f_ij + self.norms[doc_id]))  # Same expression as compute_bm25_scores()
+                if impact > largest:
+                    largest = impact
+        print(f"Largest BM25 impact {largest:.4f} found in {time.time() - start:.2f} seconds.")
+        return largest
+
+    def export_to_binary(self, output_dir, compressed=True, impact_bits=0, term_scale=False):
+        """Export the inverted index to the binary index file: the postings of each term are scored and written as packed arrays (doc ids as compressed gaps unless compressed is False), followed by the docno table. impact_bits 8 or 16 quantises the impacts with one global scale, or one scale per term with term_scale. Returns the path of the index file, or None if there were no documents"""
+        print("Computing BM25 scores and exporting them to binary index file...")
+        file_path = os.path.join(output_dir, '21207500-large.index.bin')
+        if self.processor.docs_num:
+            impact_scale = None
+            if impact_bits and not term_scale:
+                # Scale from the largest impact actually written, so the top code is used. The theoretical bound idf(1) * (1 + k) is never reached and would leave part of the code range empty
+                impact_scale = self.max_impact() / ((1 << impact_bits) - 1)
+            writer = BinaryIndexWriter(file_path, compressed=compressed, impact_bits=impact_bits, impact_scale=impact_scale)
+            for i, (term, term_postings) in enumerate(self.processor.iter_postings()):
+                term_postings = self.compute_bm25_scores(term, term_postings)  # Already in doc id order, documents were added in processing order
+                writer.add_term(term, term_postings.keys(), term_postings.values())
+                if (i + 1) % 10000 == 0:
+                    print(f"Computing BM25 scores for terms {i + 1}")
+            writer.finish(self.processor.docnos, self.processor.avg_doc_len)
+            return file_path
+        print("No BM25 scores to export.")
+        return None
 
 
 def main():
     parser = argparse.ArgumentParser(description="Process and index documents.")
     parser.add_argument('-p', '--path', type=str, required=True, help="Path to the large corpus")
+    parser.add_argument('-a', '--archive', type=str, default=None,
+                        help="Index the GX documents of a tar, tar.gz or zip archive or a TREC-style file instead of the documents directory")
+    parser.add_argument('-w', '--workers', type=int, default=1, help="Number of processes used to preprocess the documents")
+    parser.add_argument('-M', '--memory-budget', type=int, default=None, help="Megabytes of postings kept in memory before a sorted run is flushed to disk")
+    parser.add_argument('--temp-dir', type=str, default=None, help="Directory for the temporary run files")
+    parser.add_argument('--readers', type=int, default=4, help="Threads reading document files ahead of the analysis, 0 reads them synchronously")
+    parser.add_argument('--queue-depth', type=int, default=64, help="Maximum number of document files read ahead")
+    parser.add_argument('--uncompressed', action='store_true', help="Store doc ids as plain uint32 arrays instead of compressed gaps")
+    parser.add_argument('-q', '--quantise', type=int, choices=[8, 16], default=0, help="Quantise the impacts to 8 or 16 bit integers")
+    parser.add_argument('--term-scale', action='store_true', help="Quantise with one scale per term instead of one global scale")
     args = parser.parse_args()
 
-    documents_path = os.path.join(args.path, "documents")
+    documents_path = os.path.join(args.path, "documents") if args.archive is None else args.archive
     stopwords_path = os.path.join(args.path, "files", "stopwords.txt")
 
     start = time.time()
-    index = BM25Index(DocumentProcessor(documents_path, stopwords_path))
-    index.export_to_json(os.getcwd())
+    index = BM25Index(DocumentProcessor(documents_path, stopwords_path, args.workers, args.memory_budget, args.temp_dir,
+                                         stem_table_path=os.path.join(os.getcwd(), STEM_TABLE_FILE), readers=args.readers, queue_depth=args.queue_depth))
+    file_path = index.export_to_binary(os.getcwd(), not args.uncompressed, args.quantise, args.term_scale)
+    if file_path is not None:
+        print(f"Index file size: {os.path.getsize(file_path) / 2 ** 20:.2f} MB.")
     end = time.time()
     print(f"Indexing completed in {end - start:.2f} seconds.")
 
@@ -0,0 +1,73 @@
+"""
+Student ID: 21207500
+Student Name: Liyan Tao
+"""
+
+import sys
+from array import array
+from binary_index import DocnoTable
+
+
+def copy_array(typecode, values):
+    """Copy a memoryview over the mapped file, or a list of decoded values, into a compact array."""
+    if not isinstance(values, memoryview):
+        return array(typecode, values)
+    copied = array(typecode)
+    copied.frombytes(values.cast('B'))
+    return copied
+
+
+class MemoryIndex:
+    def __init__(self, reader):
+        """Load every postings list of a binary index into memory as one array('I') of doc ids and one array of impacts per term (float32, or the quantised codes with the scale of their term)."""
+        if reader.raw_tf:
+            raise ValueError("The in-memory index needs an index of BM25 impacts, not raw term frequencies.")
+        self.num_docs = reader.num_docs
+        self.num_terms = reader.num_terms
+        self.num_postings = reader.num_postings
+        self.avg_doc_len = reader.avg_doc_len
+        self.raw_tf = False
+        self.score_scale = reader.score_scale
+        self.terms = {}  # { term: (doc ids, impacts, max impact, block maxima, scale), ... }
+        for i in range(reader.num_terms):
+            record = reader.term_record(i)  # Term records are read in order, so every postings list is decoded once
+            term = reader.record_term(record)
+            doc_ids, impacts, max_impact, block_maxima, scale = reader.record_postings_with_bounds(record)
+            # Quantised codes keep their 8 or 16 bit typecode
+            self.terms[term] = (copy_array('I', doc_ids), copy_array(impacts.format, impacts), max_impact, copy_array('f', block_maxima), scale)
+        # Doc names stay packed as one UTF-8 blob with offsets instead of one str object per document
+        offsets = copy_array('I', reader.docnos.offsets)
+        self.docnos = DocnoTable(offsets, bytes(reader.docnos.blob[:offsets[-1]]))
+
+    def snapshot(self):
+        """The index never changes once loaded, so it is its own consistent snapshot."""
+        return self
+
+    def postings(self, term):
+        """Return (doc ids, impacts, scale) of a term, or None if the term is not indexed."""
+        entry = self.terms.get(term)
+        return None if entry is None else (entry[0], entry[1], entry[4])
+
+    def postings_with_bounds(self, term):
+        """Return (doc ids, impacts, max impact, block maxima, scale) of a term for dynamic pruning, or None if the term is not indexed."""
+        return self.terms.get(term)
+
+    def prefetch(self, term):
+        """Postings are already in memory, only report whether the term is indexed."""
+        return term in self.terms
+
+    def iter_terms(self):
+        """Yield (term, doc ids, impacts, scale) for every term in sorted term order."""
+        for term, (doc_ids, impacts, _, _, scale) in self.terms.items():
+            yield term, doc_ids, impacts, scale
+
+    def docno(self, doc_id):
+        """Translate an integer doc id back to its document name."""
+        return self.docnos[doc_id]
+
+    def nbytes(self):
+        """Memory held by the index: arrays, the term dictionary with its keys and tuples, and the docno table."""
+        size = sys.getsizeof(self.terms) + sys.getsizeof(self.docnos.offsets) + sys.getsizeof(self.docnos.blob)
+        for term, entry in self.terms.items():
+            size += sys.getsizeof(term) + sys.getsizeof(entry) + sum(sys.getsizeof(part) for part in entry)
+        return size
@@ -0,0 +1,118 @@
+"""
+Student ID: 21207500
+Student Name: Liyan Tao
+"""
+
+import sys
+import threading
+from collections import OrderedDict
+
+VALUE_OBJECT_SIZE = 32  # Bytes of one int or float object plus its list slot, for postings decoded into lists
+
+
+def estimate_nbytes(postings):
+    """Estimate the memory held by decoded postings (doc ids, impacts, max impact, block maxima, scale). Arrays own their data, views over the mapped file only hold a reference to it."""
+    size = 0
+    for part in (postings[0], postings[1], postings[3]):
+        size += sys.getsizeof(part)
+        if isinstance(part, list):
+            size += VALUE_OBJECT_SIZE * len(part)
+    return size
+
+
+class PostingsCache:
+    def __init__(self, index, budget):
+        """Keep the decoded postings of recently used terms of an index, evicting the least recently used ones beyond budget bytes."""
+        self.index = index
+        self.budget = budget
+        self.lock = threading.Lock()  # Queries of a server may share the cache
+        self.entries = OrderedDict()  # { term: (postings, size), ... } from least to most recently used
+        self.generation = None  # Generation of the index snapshot the entries were decoded from
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def snapshot(self):
+        """Return a view of the current index snapshot whose postings go through the cache. Entries of an older generation (segments added, merged or deleted) are dropped."""
+        snapshot = self.index.snapshot()
+        generation = getattr(snapshot, 'generation', 0)  # A single index file never changes
+        with self.lock:
+            if generation != self.generation:
+                self.entries.clear()
+                self.nbytes = 0
+                self.generation = generation
+        return CachedSnapshot(self, snapshot, generation)
+
+    @property
+    def score_scale(self):
+        return self.index.snapshot().score_scale
+
+    def postings_with_bounds(self, term):
+        return self.snapshot().postings_with_bounds(term)
+
+    def postings(self, term):
+        return self.snapshot().postings(term)
+
+    def prefetch(self, term):
+        """Decode the postings of a term into the cache ahead of their first use."""
+        self.index.prefetch(term)
+        return self.postings_with_bounds(term) is not None
+
+    def docno(self, doc_id):
+        return self.index.docno(doc_id)
+
+    def get(self, snapshot, generation, term):
+        """Return the postings of a term from the cache, decoding and adding them on a miss."""
+        with self.lock:
+            entry = self.entries.get(term)
+            if entry is not None and generation == self.generation:
+                self.entries.move_to_end(term)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+        postings = snapshot.postings_with_bounds(term)
+        if postings is None:
+            return None
+        doc_ids, impacts, max_impact, block_maxima, scale = postings
+        if not isinstance(doc_ids, list):
+            doc_ids = doc_ids.tolist()  # Views over the mapped file and packed doc ids are cached decoded, as lists
+        postings = (doc_ids, impacts, max_impact, block_maxima, scale)
+        size = estimate_nbytes(postings)
+        with self.lock:
+            if generation != self.generation or size > self.budget or term in self.entries:
+                return postings  # Stale snapshot, too large to cache, or decoded by another query meanwhile
+            self.entries[term] = (postings, size)
+            self.nbytes += size
+            while self.nbytes > self.budget:
+                _, (_, evicted_size) = self.entries.popitem(last=False)
+                self.nbytes -= evicted_size
+                self.evictions += 1
+        return postings
+
+    def stats(self):
+        """Return the cache counters: { hits, misses, evictions, entries, bytes }"""
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'entries': len(self.entries), 'bytes': self.nbytes}
+
+
+class CachedSnapshot:
+    def __init__(self, cache, snapshot, generation):
+        self.cache = cache
+        self.inner = snapshot
+        self.generation = generation
+        self.score_scale = snapshot.score_scale
+
+    def snapshot(self):
+        return self
+
+    def postings_with_bounds(self, term):
+        return self.cache.get(self.inner, self.generation, term)
+
+    def postings(self, term):
+        postings = self.cache.get(self.inner, self.generation, term)
+        return None if postings is None else (postings[0], postings[1], postings[4])
+
+    def docno(self, doc_id):
+        return self.inner.docno(doc_id)
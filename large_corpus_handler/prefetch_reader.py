@@ -0,0 +1,56 @@
+"""
+Student ID: 21207500
+Student Name: Liyan Tao
+"""
+
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+FILES_PER_READ = 8  # Files read by one reader task, so small documents do not pay the thread hand-off once each
+
+
+def read_files(file_paths):
+    """Read the raw bytes of some files and return ([bytes, ...], seconds spent reading)."""
+    start = time.time()
+    contents = []
+    for file_path in file_paths:
+        with open(file_path, 'rb') as file:
+            contents.append(file.read())
+    return contents, time.time() - start
+
+
+class PrefetchingReader:
+    def __init__(self, readers=4, queue_depth=64):
+        """Read files ahead of their analysis with a pool of reader threads. At most queue_depth files are being read or waiting for the analysis at a time, so the memory used stays bounded."""
+        self.readers = readers  # Number of reader threads, 0 reads the files when they are needed
+        self.queue_depth = queue_depth
+        self.io_wait = 0  # Seconds the analysis spent waiting for files to be read
+        self.read_time = 0  # Seconds spent reading, by the reader threads while the analysis runs
+
+    def read_files(self, file_paths):
+        """Yield (file_path, bytes) for every file, in the given order."""
+        file_paths = iter(file_paths)
+        batches = iter(lambda: list(islice(file_paths, FILES_PER_READ)), [])
+        if self.readers < 1:
+            for batch in batches:
+                contents, read_time = read_files(batch)
+                self.io_wait += read_time
+                self.read_time += read_time
+                yield from zip(batch, contents)
+            return
+        with ThreadPoolExecutor(self.readers) as pool:
+            pending = deque()  # (file paths, future) of the batches being read ahead, in order
+            for batch in islice(batches, max(self.queue_depth // FILES_PER_READ, 1)):
+                pending.append((batch, pool.submit(read_files, batch)))
+            while pending:
+                batch, future = pending.popleft()
+                start = time.time()
+                contents, read_time = future.result()  # Blocks only when the readers are behind the analysis
+                self.io_wait += time.time() - start
+                self.read_time += read_time
+                next_batch = next(batches, None)
+                if next_batch is not None:  # Keep the queue full
+                    pending.append((next_batch, pool.submit(read_files, next_batch)))
+                yield from zip(batch, contents)
@@ -0,0 +1,106 @@
+"""
+Student ID: 21207500
+Student Name: Liyan Tao
+"""
+
+import json
+import time
+import asyncio
+import argparse
+
+
+class QueryClient:
+    def __init__(self, host='127.0.0.1', port=8765):
+        self.host = host
+        self.port = port
+
+    async def connect(self):
+        return await asyncio.open_connection(self.host, self.port)
+
+    async def request(self, connection, request):
+        """Send one request on a connection and wait for its response."""
+        reader, writer = connection
+        writer.write((json.dumps(request) + '\n').encode('utf-8'))
+        await writer.drain()
+        line = await reader.readline()
+        if not line:
+            raise ConnectionError("The server closed the connection.")
+        response = json.loads(line)
+        if 'error' in response:
+            raise ValueError(response['error'])
+        return response
+
+    async def send(self, request):
+        """Send a single request on a new connection."""
+        connection = await self.connect()
+        try:
+            return await self.request(connection, request)
+        finally:
+            connection[1].close()
+
+    async def run_queries(self, queries, concurrency, k=None):
+        """Send (query_id, query) pairs over concurrency connections at once and return { query_id: results } and the latency of every query."""
+        pending = list(reversed(queries))
+        results = {}
+        latencies = []
+
+        async def worker():
+            connection = await self.connect()
+            try:
+                while pending:
+                    query_id, query = pending.pop()
+                    start = time.time()
+                    response = await self.request(connection, {'query': query, 'k': k})
+                    latencies.append(time.time() - start)
+                    results[query_id] = response['results']
+            finally:
+                connection[1].close()
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return results, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Send queries to a running query server (query_large_corpus.py -m server).")
+    parser.add_argument('--host', type=str, default='127.0.0.1', help="Address of the server")
+    parser.add_argument('--port', type=int, default=8765, help="Port of the server")
+    parser.add_argument('-q', '--query', type=str, default=None, help="Run a single query and print its results")
+    parser.add_argument('-f', '--queries-file', type=str, default=None, help="Run every query of a queries file ('id text' per line)")
+    parser.add_argument('-c', '--concurrency', type=int, default=4, help="Connections sending queries of the queries file at once")
+    parser.add_argument('-k', '--top-k', type=int, default=None, help="Number of results per query, the server's default if not given")
+    parser.add_argument('-o', '--output', type=str, default=None, help="Write the results of the queries file in the results file format")
+    parser.add_argument('--reload', action='store_true', help="Ask the server to reload the index")
+    parser.add_argument('--stats', action='store_true', help="Print the server statistics")
+    args = parser.parse_args()
+
+    client = QueryClient(args.host, args.port)
+    if args.reload:
+        print(f"Index reloaded, generation {asyncio.run(client.send({'command': 'reload'}))['generation']}.")
+    if args.query is not None:
+        response = asyncio.run(client.send({'query': args.query, 'k': args.top_k}))
+        print(f"Query completed in {response['seconds']:.4f} seconds.")
+        print(f"{'Rank':<10}{'Doc ID':<25}{'Score'}")
+        for rank, (doc_id, score) in enumerate(response['results'], start=1):
+            print(f"{rank:<10}{doc_id:<25}{score:.4f}")
+    if args.queries_file is not None:
+        with open(args.queries_file, 'r', encoding='utf-8') as file:
+            queries = [tuple(line.strip().split(' ', 1)) for line in file]
+        start = time.time()
+        results, latencies = asyncio.run(client.run_queries(queries, args.concurrency, args.top_k))
+        duration = time.time() - start
+        latencies.sort()
+        if not latencies:
+            latencies = [0]
+        print(f"{len(queries)} queries in {duration:.4f} seconds ({len(queries) / duration:.1f} queries/s), "
+              f"median latency {latencies[len(latencies) // 2]:.4f} seconds, max {latencies[-1]:.4f} seconds.")
+        if args.output is not None:
+            with open(args.output, 'w', encoding='utf-8') as file:
+                for query_id, _ in queries:  # In the order of the queries file
+                    for rank, (doc_id, score) in enumerate(results[query_id], start=1):
+                        file.write(f"{query_id} {doc_id} {rank} {score:.4f}\n")
+    if args.stats:
+        print(json.dumps(asyncio.run(client.send({'command': 'stats'})), indent=2))
+
+
+if __name__ == "__main__":
+    main()
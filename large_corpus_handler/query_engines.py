@@ -0,0 +1,367 @@
+"""
+Student ID: 21207500
+Student Name: Liyan Tao
+"""
+
+import heapq
+from bisect import bisect_left, bisect_right
+from itertools import compress
+from operator import attrgetter
+from binary_index import BLOCK_SIZE, PackedDocIds, block_last_doc_ids
+
+by_doc = attrgetter('doc')
+END_OF_POSTINGS = float('inf')  # Doc id of an exhausted cursor
+UPPER_BOUND_SLACK = 1 + 1e-9  # Upper bounds are widened slightly so float rounding can never prune a document that belongs in the top k
+SMALL_QUERY_POSTINGS = 4096  # The automatic strategy scores queries with fewer postings exhaustively, pruning would not pay off
+MAXSCORE_MIN_TERMS = 4  # The automatic strategy uses MaxScore for queries with at least this many distinct terms
+MAXSCORE_MAX_K = 200  # ... and at most this many results, deeper rankings score faster window by window with Block-Max WAND
+PROBE_COST = 4  # Looking up a document in a postings list costs about as much as walking this many postings
+
+
+class PostingsCursor:
+    def __init__(self, term, doc_ids, impacts, max_impact, block_maxima, scale, weight):
+        """Walk the postings of a term one block of BLOCK_SIZE doc ids at a time. Only the block under the cursor is held as a list: packed doc ids are decoded a block at a time and views over the mapped file are copied a block at a time, so postings the cursor skips are never decoded."""
+        self.term = term
+        self.doc_ids = doc_ids
+        self.impacts = impacts
+        self.block_maxima = block_maxima
+        # Last doc id of every block, so the block holding a target is found without touching the postings in between
+        if isinstance(doc_ids, PackedDocIds):
+            self.block_last_docs = doc_ids.block_last_docs  # Stored in the index file
+            self.read_block = doc_ids.block
+        else:
+            self.block_last_docs = block_last_doc_ids(doc_ids)
+            self.read_block = self.slice_block
+        self.num_blocks = len(self.block_last_docs)
+        self.scale = scale  # Score of a posting = impact * scale, see BinaryIndexReader.postings()
+        self.weight = weight  # Number of times the term occurs in the query
+        self.bound_factor = scale * weight * UPPER_BOUND_SLACK  # Turns a bound on the stored impacts into a bound on the score
+        self.max_score = max_impact * self.bound_factor
+        self.size = len(doc_ids)
+        if self.size:
+            self.load_block(0)
+        else:
+            self.block, self.last_doc, self.pos, self.doc = 0, END_OF_POSTINGS, 0, END_OF_POSTINGS
+
+    def slice_block(self, block):
+        """Return the doc ids of a block of a decoded postings list, or copied out of a view over the mapped file."""
+        doc_ids = self.doc_ids[block * BLOCK_SIZE:(block + 1) * BLOCK_SIZE]
+        return doc_ids.tolist() if isinstance(doc_ids, memoryview) else doc_ids
+
+    def load_block(self, block):
+        """Read a block and move to its first posting."""
+        self.block = block
+        self.block_start = block * BLOCK_SIZE
+        self.block_docs = self.read_block(block)
+        self.last_doc = self.block_last_docs[block]
+        self.pos = self.block_start  # Position of the current posting in the whole postings list, for its impact
+        self.doc = self.block_docs[0]
+
+    def next_geq(self, target):
+        """Move to the first posting whose doc id is >= target."""
+        if self.doc >= target:
+            return
+        if target > self.last_doc:  # Beyond the current block, skip to the block holding target
+            block = bisect_left(self.block_last_docs, target, self.block + 1)
+            if block == self.num_blocks:
+                self.pos = self.size
+                self.doc = END_OF_POSTINGS
+                return
+            self.load_block(block)
+            if self.doc >= target:
+                return
+        docs = self.block_docs
+        offset = self.pos - self.block_start + 1  # target <= last_doc, so the block holds a posting >= target
+        if docs[offset] < target:  # Most moves are a single step, only search otherwise
+            offset = bisect_left(docs, target, offset + 1)
+        self.pos = self.block_start + offset
+        self.doc = docs[offset]
+
+    def collect(self, end):
+        """Return (doc ids, impacts) of the postings from the cursor up to doc id end, and move the cursor past them."""
+        doc_ids, impacts = [], []
+        while self.doc <= end:
+            offset = self.pos - self.block_start
+            stop = bisect_right(self.block_docs, end, offset)
+            doc_ids += self.block_docs[offset:stop]
+            impacts += self.impacts[self.pos:self.block_start + stop]
+            if stop < len(self.block_docs):
+                self.pos = self.block_start + stop
+                self.doc = self.block_docs[stop]
+            elif self.block + 1 < self.num_blocks:
+                self.load_block(self.block + 1)
+            else:
+                self.pos = self.size
+                self.doc = END_OF_POSTINGS
+        return doc_ids, impacts
+
+    def probe(self, doc_ids):
+        """Return (doc ids, impacts) of the postings of the given ascending doc ids that the term has, moving the cursor to the last of them."""
+        found, impacts = [], []
+        for doc_id in doc_ids:
+            self.next_geq(doc_id)
+            if self.doc == doc_id:
+                found.append(doc_id)
+                impacts.append(self.impacts[self.pos])
+        return found, impacts
+
+    def window_size(self, end):
+        """Return an estimate of the number of postings from the cursor up to doc id end: the postings of the blocks they lie in."""
+        return (bisect_left(self.block_last_docs, end, self.block) - self.block + 1) * BLOCK_SIZE
+
+    def window_bound(self, end):
+        """Return an upper bound of the scores of the postings from the cursor up to doc id end: the largest maximum of the blocks they lie in."""
+        last_block = bisect_left(self.block_last_docs, end, self.block)
+        return max(self.block_maxima[self.block:last_block + 1]) * self.bound_factor
+
+    def block_bound(self, target):
+        """Return (upper bound, last doc id) of the block holding the first posting >= target, from the table of block last doc ids, without moving the cursor or decoding the block."""
+        if target <= self.last_doc:
+            block = self.block
+        else:
+            block = bisect_left(self.block_last_docs, target, self.block + 1)
+            if block == self.num_blocks:
+                return 0, END_OF_POSTINGS
+        return self.block_maxima[block] * self.bound_factor, self.block_last_docs[block]
+
+
+def exhaustive(index, query_terms, k):
+    """Term-at-a-time over the postings of the query terms, summing the scores in an accumulator per document."""
+    postings = {}
+    for term in query_terms:
+        if term not in postings:
+            postings[term] = index.postings(term)
+    return accumulate(postings, query_terms, k)
+
+
+def accumulate(postings, query_terms, k):
+    """Sum the scores of every posting of the query terms in an accumulator per document, { term: (doc ids, impacts, scale) or None } gives the postings."""
+    accumulators = {}  # { doc_id: partial score, ... }
+    for term in query_terms:
+        if postings[term] is None:  # Term does not appear in the collection
+            continue
+        doc_ids, impacts, scale = postings[term]
+        if scale == 1:
+            for doc_id, score in zip(doc_ids, impacts):
+                accumulators[doc_id] = accumulators.get(doc_id, 0) + score
+        else:  # Codes quantised with a scale per term
+            for doc_id, code in zip(doc_ids, impacts):
+                accumulators[doc_id] = accumulators.get(doc_id, 0) + code * scale
+    # Select the top k by score in descending order, ties by doc id, with a bounded heap instead of sorting every match.
+    # Like the original engine only documents with a positive score are results
+    return heapq.nsmallest(k, ((doc_id, score) for doc_id, score in accumulators.items() if score > 0), key=lambda x: (-x[1], x[0]))
+
+
+def open_cursors(index, query_terms):
+    """Open one cursor per distinct query term that appears in the collection."""
+    weights = {}
+    for term in query_terms:
+        weights[term] = weights.get(term, 0) + 1
+    cursors = []
+    for term, weight in weights.items():
+        postings = index.postings_with_bounds(term)
+        if postings is not None:
+            cursors.append(PostingsCursor(term, *postings, weight))
+    return cursors
+
+
+def score_document(cursors, query_terms):
+    """Score the document all the given cursors point at. Impacts are added in query term order, exactly as the exhaustive accumulator does, so both give bit-identical scores."""
+    impacts = {cursor.term: cursor.impacts[cursor.pos] * cursor.scale for cursor in cursors}
+    score = 0
+    for term in query_terms:
+        if term in impacts:
+            score += impacts[term]
+    return score
+
+
+def push_result(top, k, score, doc_id):
+    """Offer a scored document to the min-heap of the top k results and return the new threshold. Documents arrive in increasing doc id order, so a tie with the k-th result never displaces it."""
+    if score <= 0:  # Only documents with a positive score are results, as in accumulate()
+        pass
+    elif len(top) < k:
+        heapq.heappush(top, (score, -doc_id))
+    elif score > top[0][0]:
+        heapq.heapreplace(top, (score, -doc_id))
+    return top[0][0] if len(top) == k else float('-inf')
+
+
+def sorted_results(top):
+    """Turn the result heap into (doc_id, score) pairs by descending score, ties by doc id."""
+    return [(-negative_doc_id, score) for score, negative_doc_id in sorted(top, key=lambda x: (-x[0], -x[1]))]
+
+
+def wand(index, query_terms, k, block_max=False):
+    """Document-at-a-time WAND: the cursors are kept sorted by doc id and a document is only scored when the upper bounds of the terms up to it can beat the current k-th score. With block_max the bound is tightened with the per-block maxima (Block-Max WAND)."""
+    return wand_search(open_cursors(index, query_terms), query_terms, k, block_max)
+
+
+def advance(cursors, end, target):
+    """Move cursors[:end] to their first posting >= target, from the last one down. Each cursor is then shifted into place past the cursors it overtook (the ones after it are already sorted, so nothing else moves), and dropped once exhausted."""
+    for i in range(end - 1, -1, -1):
+        cursor = cursors[i]
+        if cursor.doc < target:
+            cursor.next_geq(target)
+        doc = cursor.doc
+        if doc == END_OF_POSTINGS:
+            del cursors[i]
+            continue
+        j = i + 1
+        while j < len(cursors) and cursors[j].doc < doc:
+            cursors[j - 1] = cursors[j]
+            j += 1
+        cursors[j - 1] = cursor
+
+
+def score_window(cursors, query_terms, end, top, k, threshold, block_max):
+    """Score the documents up to doc id end of the given cursors term-at-a-time, adding the impacts in query term order exactly as the exhaustive accumulator does, and offer the documents that beat the threshold to the top k in doc id order. Returns the new threshold."""
+    # A document holding only terms whose bounds add up to no more than the threshold cannot enter the top k. The bound of a
+    # term is its maximum score, or with block_max the largest maximum of the blocks the window covers
+    bounds = sorted((cursor.window_bound(end) if block_max else cursor.max_score, cursor.term) for cursor in cursors)
+    non_essential = set()
+    bound = 0
+    for term_bound, term in bounds:
+        bound += term_bound
+        if bound > threshold:
+            break
+        non_essential.add(term)
+    # The postings of the other terms are taken in full, their documents are the candidates
+    postings = {}
+    candidates = set()
+    for cursor in cursors:
+        if cursor.term not in non_essential:
+            postings[cursor.term] = cursor.collect(end)
+            candidates.update(postings[cursor.term][0])
+    if non_essential:
+        sorted_candidates = sorted(candidates)
+        for cursor in cursors:
+            if cursor.term not in non_essential:
+                continue
+            if len(sorted_candidates) * PROBE_COST < cursor.window_size(end):
+                # Few candidates: look them up, blocks without a candidate are never decoded
+                postings[cursor.term] = cursor.probe(sorted_candidates)
+            else:
+                doc_ids, impacts = cursor.collect(end)
+                is_candidate = [doc_id in candidates for doc_id in doc_ids]
+                postings[cursor.term] = list(compress(doc_ids, is_candidate)), list(compress(impacts, is_candidate))
+    for cursor in cursors:
+        if cursor.scale != 1:  # Codes quantised with a scale per term
+            doc_ids, codes = postings[cursor.term]
+            postings[cursor.term] = doc_ids, [code * cursor.scale for code in codes]
+    accumulators = {}
+    for term in query_terms:
+        if term in postings:
+            for doc_id, score in zip(*postings[term]):
+                accumulators[doc_id] = accumulators.get(doc_id, 0) + score
+    for doc_id in sorted(doc_id for doc_id, score in accumulators.items() if score > threshold):
+        threshold = push_result(top, k, accumulators[doc_id], doc_id)
+    return threshold
+
+
+def wand_search(cursors, query_terms, k, block_max):
+    top = []  # Min-heap of (score, -doc_id): the root is the result that would be dropped first
+    threshold = float('-inf')
+    # Sorted once, afterwards advance() only moves the cursors that advanced into place
+    cursors = sorted((cursor for cursor in cursors if cursor.doc != END_OF_POSTINGS), key=by_doc)
+    while cursors:
+        bound = 0
+        for pivot, cursor in enumerate(cursors):
+            bound += cursor.max_score
+            if bound > threshold:
+                break
+        else:  # No remaining document can enter the top k
+            break
+        pivot_cursor = cursor
+        pivot_doc = cursor.doc
+        last = len(cursors) - 1
+        while pivot < last and cursors[pivot + 1].doc == pivot_doc:
+            pivot += 1
+        if block_max:
+            # Bound the documents from pivot_doc on with the maxima of the blocks holding pivot_doc, before any cursor moves
+            block_bound = 0
+            next_doc = cursors[pivot + 1].doc if pivot < last else END_OF_POSTINGS
+            for cursor in cursors[:pivot + 1]:
+                block_score, block_last_doc = cursor.block_bound(pivot_doc)
+                block_bound += block_score
+                next_doc = min(next_doc, block_last_doc + 1)
+            if block_bound <= threshold:
+                # No document before the end of the shortest of these blocks (or the next cursor) can enter the top k, jump past it
+                advance(cursors, pivot + 1, next_doc)
+                continue
+        end = pivot_cursor.last_doc
+        # No document before pivot_doc can beat the threshold, skip the cursors in front of the pivot to it
+        advance(cursors, pivot, pivot_doc)
+        window = 0
+        while window < len(cursors) and cursors[window].doc <= end:
+            window += 1
+        threshold = score_window(cursors[:window], query_terms, end, top, k, threshold, block_max)
+        advance(cursors, window, end + 1)
+    return sorted_results(top)
+
+
+def block_max_wand(index, query_terms, k):
+    """Block-Max WAND, see wand()."""
+    return wand(index, query_terms, k, block_max=True)
+
+
+def maxscore(index, query_terms, k):
+    """Document-at-a-time MaxScore: the terms are ordered by maximum score and split into non-essential terms, whose bounds together cannot beat the current k-th score, and essential terms. Only the postings of essential terms are traversed; non-essential terms are probed by skipping, and only while the document can still qualify."""
+    return maxscore_search(open_cursors(index, query_terms), query_terms, k)
+
+
+def maxscore_search(cursors, query_terms, k):
+    cursors.sort(key=lambda cursor: cursor.max_score)
+    bounds = []  # bounds[i] = sum of the maximum scores of cursors[0..i]
+    total = 0
+    for cursor in cursors:
+        total += cursor.max_score
+        bounds.append(total)
+    top = []
+    threshold = float('-inf')
+    first_essential = 0  # cursors[:first_essential] are the non-essential terms
+    while first_essential < len(cursors):
+        doc = min(cursor.doc for cursor in cursors[first_essential:])
+        if doc == END_OF_POSTINGS:
+            break
+        matched = []
+        score = 0
+        for cursor in cursors[first_essential:]:
+            if cursor.doc == doc:
+                matched.append(cursor)
+                score += cursor.impacts[cursor.pos] * cursor.scale * cursor.weight
+        essential_matched = len(matched)
+        # Probe the non-essential terms from the highest bound down, give up as soon as the document cannot qualify
+        qualifies = True
+        for i in range(first_essential - 1, -1, -1):
+            if score + bounds[i] <= threshold:
+                qualifies = False
+                break
+            cursor = cursors[i]
+            cursor.next_geq(doc)
+            if cursor.doc == doc:
+                matched.append(cursor)
+                score += cursor.impacts[cursor.pos] * cursor.scale * cursor.weight
+        if qualifies:
+            # Rescore in query term order so the score is bit-identical to the exhaustive accumulator
+            threshold = push_result(top, k, score_document(matched, query_terms), doc)
+            while first_essential < len(cursors) and bounds[first_essential] <= threshold:
+                first_essential += 1
+        for cursor in matched[:essential_matched]:
+            cursor.next_geq(doc + 1)
+    return sorted_results(top)
+
+
+def choose_engine(index, query_terms, k):
+    """Pick the strategy from the statistics of the query terms: small postings lists are scored exhaustively, long queries for a shallow ranking use MaxScore and the others Block-Max WAND."""
+    cursors = open_cursors(index, query_terms)
+    if sum(cursor.size for cursor in cursors) <= SMALL_QUERY_POSTINGS:
+        postings = dict.fromkeys(query_terms)
+        for cursor in cursors:
+            postings[cursor.term] = (cursor.doc_ids, cursor.impacts, cursor.scale)
+        return accumulate(postings, query_terms, k)
+    if len(cursors) >= MAXSCORE_MIN_TERMS and k <= MAXSCORE_MAX_K:
+        return maxscore_search(cursors, query_terms, k)
+    return wand_search(cursors, query_terms, k, block_max=True)
+
+
+ENGINES = {'exhaustive': exhaustive, 'wand': wand, 'bmw': block_max_wand, 'maxscore': maxscore, 'auto': choose_engine}
@@ -4,28 +4,132 @@ Student Name: Liyan Tao
 """
 
 import os
-import json
 import argparse
-from files import porter
+import multiprocessing
+from stemmer import StemTable
+from analyzer import Analyzer
+from query_server import QueryServer
+from binary_index import BinaryIndexReader
+from segmented_index import SegmentedIndex
+from query_engines import ENGINES
+from sparse_index import SparseIndex
+from memory_index import MemoryIndex
+from postings_cache import PostingsCache
+from result_cache import ResultCache, query_key
+from shared_index import SharedIndexFile
 import time
 
+QUERY_STEMS_LIMIT = 100000  # Query words whose stems are memoised
+QUERIES_PER_TASK = 16  # Queries sent to a worker process at a time, so the results come back in order without a round trip per query
+worker_bm25 = None  # The BM25 of a query worker process
+
+
+def init_query_worker(bm25, settings):
+    """Give a query worker process its BM25: the parent's own when the worker is forked (the mapped index file and everything loaded at startup are shared copy-on-write), otherwise one built from the same settings over the same index file"""
+    global worker_bm25
+    worker_bm25 = bm25 if bm25 is not None else BM25(*settings)
+
+
+def run_queries_in_worker(queries):
+    """Perform a list of (query_id, query) in a worker process and return [(query_id, results, seconds), ...] in the same order"""
+    completed = []
+    for query_id, query in queries:
+        start = time.time()
+        results = worker_bm25.perform_query(query)
+        completed.append((query_id, results, time.time() - start))
+    return completed
+
 
 class BM25:
-    def __init__(self, index_file_path, stopwords_file_path):
-        self.index = self.load_index(index_file_path)
+    def __init__(self, index_file_path, stopwords_file_path, engine='exhaustive', top_k=15, sparse=False, in_memory=False, warm_up_file_path=None, postings_cache_mb=0, result_cache_size=1000, shared_memory=False):
+        start = time.time()
+        self.shared_index = None  # Copy of the index file in shared memory, attached to by the query workers
+        if shared_memory:
+            self.shared_index = shared_memory if isinstance(shared_memory, SharedIndexFile) else self.share_index(index_file_path)
+        # Everything needed to build the same BM25 again, in a query worker process that cannot be forked from this one
+        self.settings = (index_file_path, stopwords_file_path, engine, top_k, sparse, in_memory, warm_up_file_path, postings_cache_mb, result_cache_size,
+                         self.shared_index or False)
+        self.top_k = top_k  # Number of results returned per query
+        self.engine = ENGINES[engine]  # Query evaluation strategy, see query_engines.py
+        self.index = self.load_index(index_file_path, in_memory)
+        self.sparse_index = self.load_sparse_index() if sparse else None  # Optional NumPy backend for batches of queries
+        if postings_cache_mb > 0:  # Decoded postings of recently queried terms are kept between queries, warm-up fills the cache too
+            self.index = PostingsCache(self.index, postings_cache_mb * 2 ** 20)
+        self.result_cache = ResultCache(result_cache_size) if result_cache_size > 0 else None  # Final results of repeated queries
         self.stopwords = self.load_stopwords(stopwords_file_path)
-        self.stemmer = porter.PorterStemmer()
+        # Same analysis as the indexer. The stem table saved with the index is the whole vocabulary and slow to load, so queries
+        # start with an empty table that only memoises their own words; the stemmer gives the same stems as the saved ones
+        self.analyzer = Analyzer(self.stopwords, StemTable(max_new_words=QUERY_STEMS_LIMIT))
+        if warm_up_file_path is not None:
+            self.warm_up(warm_up_file_path)
+        self.startup_time = time.time() - start  # Reported with the first query, see report_first_query()
+        self.first_query_done = False
 
-    def load_index(self, index_file_path):
-        """Load the index file into memory."""
+    def load_index(self, index_file_path, in_memory=False):
+        """Open the binary index file, or a segmented index if the path is a directory. Files are memory-mapped, so only headers are read here and postings are paged in on demand. With in_memory the postings are copied into compact arrays instead."""
         print(f"Loading index file...")
         start = time.time()
-        with open(index_file_path, 'r', encoding='utf-8') as file:
-            index = json.load(file)
+        if os.path.isdir(index_file_path):
+            if in_memory:
+                raise ValueError("The in-memory index needs the binary index file, segmented indexes are not supported.")
+            index = SegmentedIndex(index_file_path)
+        else:
+            index = BinaryIndexReader(index_file_path, self.shared_index.buffer if self.shared_index is not None else None)
+            if in_memory:
+                index = MemoryIndex(index)
         end = time.time()
         print(f"Index loaded in {end - start:.4f} seconds.")
+        if in_memory:
+            print(f"In-memory index uses {index.nbytes() / 2 ** 20:.1f} MB, {index.nbytes() / max(index.num_postings, 1):.1f} bytes per posting.")
         return index
 
+    def share_index(self, index_file_path):
+        """Copy the binary index file into shared memory, so every query worker reads the same physical copy."""
+        if os.path.isdir(index_file_path):
+            raise ValueError("The shared memory index needs the binary index file, segmented indexes are not supported.")
+        start = time.time()
+        shared_index = SharedIndexFile.create(index_file_path)
+        end = time.time()
+        print(f"Index file copied to shared memory '{shared_index.block.name}' ({shared_index.size / 2 ** 20:.1f} MB) in {end - start:.4f} seconds.")
+        return shared_index
+
+    def load_sparse_index(self):
+        """Copy the impacts of the binary index into the NumPy CSR matrix of the sparse backend."""
+        if isinstance(self.index, SegmentedIndex):
+            raise ValueError("The sparse backend needs the binary index file, segmented indexes are not supported.")
+        print(f"Building sparse matrix...")
+        start = time.time()
+        sparse_index = SparseIndex(self.index)
+        end = time.time()
+        print(f"Sparse matrix of {self.index.num_postings} postings ({sparse_index.nbytes() / 2 ** 20:.1f} MB) built in {end - start:.4f} seconds.")
+        return sparse_index
+
+    def warm_up(self, hot_terms_file_path):
+        """Prefetch the postings of frequently queried terms (one or more words per line, processed like a query) so the first queries do not wait for the disk."""
+        start = time.time()
+        with open(hot_terms_file_path, 'r', encoding='utf-8') as file:
+            terms = {term for line in file for term in self.process_query(line)}
+        found = sum(1 for term in terms if self.index.prefetch(term))
+        end = time.time()
+        print(f"Warmed up {found} of {len(terms)} hot terms in {end - start:.4f} seconds.")
+
+    def report_first_query(self, duration):
+        """Print the time from starting up to the answer of the first query once."""
+        if not self.first_query_done:
+            self.first_query_done = True
+            print(f"Time to first query: {self.startup_time + duration:.4f} seconds (startup {self.startup_time:.4f} seconds).")
+
+    def report_caches(self):
+        """Print the hit, miss and eviction counters of the result and postings caches that are enabled."""
+        if self.result_cache is not None:
+            stats = self.result_cache.stats()
+            print(f"Result cache: {stats['hits']} hits, {stats['misses']} misses, {stats['evictions']} evictions, {stats['entries']} queries.")
+        if isinstance(self.index, PostingsCache):
+            stats = self.index.stats()
+            lookups = max(stats['hits'] + stats['misses'], 1)
+            print(f"Postings cache: {stats['hits']} hits, {stats['misses']} misses ({stats['hits'] / lookups:.1%} hit rate), "
+                  f"{stats['evictions']} evictions, {stats['entries']} terms in {stats['bytes'] / 2 ** 20:.1f} MB.")
+
     def load_stopwords(self, stopwords_file):
         """Load stopwords from file."""
         with open(stopwords_file, 'r', encoding='utf-8') as file:
@@ -33,23 +137,35 @@ class BM25:
 
     def process_query(self, query):
         """Process the query: convert to lowercase, remove punctuation, remove stopwords, and perform stemming."""
-        query = query.translate(str.maketrans('', '', '!"#$%&\'()*+,-./:;<=>?@[\\]^_`{|}~'))  # Remove punctuation
-        terms = query.lower().split()  # Convert to lowercase and split
-        terms = [term for term in terms if term not in self.stopwords]  # Remove stopwords
-        terms = [self.stemmer.stem(term) for term in terms]  # Perform stemming
-        return terms
-
-    def perform_query(self, query):
-        """Perform the query and return sorted results."""
+        return self.analyzer.analyze(query)
+
+    def perform_query(self, query, k=None):
+        """Perform the query with the selected engine and return the top k results (top_k by default), or all results if fewer."""
         query_terms = self.process_query(query)
-        results = {}
-        for doc_id, doc_terms in self.index.items():
-            score = sum(doc_terms.get(term, 0) for term in query_terms)
-            if score > 0:
-                results[doc_id] = score
-        # Sort results by score in descending order and return the top 15 results, or all results if fewer than 15
-        sorted_results = sorted(results.items(), key=lambda x: x[1], reverse=True)[:15]
-        return sorted_results
+        k = k or self.top_k
+        index = self.index.snapshot()  # Keep one consistent view of the index for the whole query
+        generation = getattr(index, 'generation', 0)  # Only a segmented index changes while queries run
+        if self.result_cache is not None:
+            results = self.result_cache.get(query_key(query_terms, k), generation)
+            if results is not None:
+                return results
+        if self.sparse_index is not None:
+            results = self.translate_results(self.sparse_index.score_batch([query_terms], k)[0])
+        else:
+            # Only the final results are translated to doc names, with the same snapshot, and scaled back from quantised impacts
+            results = [(index.docno(doc_id), score * index.score_scale) for doc_id, score in self.engine(index, query_terms, k)]
+        if self.result_cache is not None:
+            self.result_cache.put(query_key(query_terms, k), generation, results)
+        return results
+
+    def translate_results(self, results):
+        """Translate the doc ids of the final results to doc names and scale back quantised scores."""
+        return [(self.index.docno(doc_id), score * self.index.score_scale) for doc_id, score in results]
+
+    def perform_batch(self, queries):
+        """Perform a list of queries as one batch with the sparse backend and return the results of each."""
+        batch_query_terms = [self.process_query(query) for query in queries]
+        return [self.translate_results(results) for results in self.sparse_index.score_batch(batch_query_terms, self.top_k)]
 
     def interactive_mode(self):
         """Interactive mode: input queries and print results."""
@@ -61,7 +177,9 @@ class BM25:
             results = self.perform_query(query)
             end_time = time.time()  # Query end time
             duration = end_time - start_time  # Calculate time difference
+            self.report_first_query(duration)
             print(f"Query completed in {duration:.4f} seconds.")  # Print query time
+            self.report_caches()
             if results:
                 print(f"{'Rank':<10}{'Doc ID':<25}{'Score'}")
                 for rank, (doc_id, score) in enumerate(results, start=1):
@@ -69,43 +187,106 @@ class BM25:
             else:
                 print("No results found.")
 
-    def automatic_mode(self, queries_file, output_file):
-        """Automatic mode: read queries from file and write results to the same directory as the script."""
+    def perform_parallel(self, queries, workers):
+        """Split a list of (query_id, query) over a pool of worker processes and yield (query_id, results, seconds) in the original order."""
+        # Forked workers inherit this BM25 without copying it; elsewhere (Windows) each worker maps the index file itself
+        bm25 = self if multiprocessing.get_start_method() == 'fork' else None
+        tasks = [queries[i:i + QUERIES_PER_TASK] for i in range(0, len(queries), QUERIES_PER_TASK)]
+        with multiprocessing.Pool(workers, initializer=init_query_worker, initargs=(bm25, self.settings)) as pool:
+            for completed in pool.imap(run_queries_in_worker, tasks):  # imap returns the tasks in submission order
+                yield from completed
+
+    def automatic_mode(self, queries_file, output_file, workers=1):
+        """Automatic mode: read queries from file and write results to the same directory as the script. With workers > 1 the queries are split over that many worker processes."""
         with open(queries_file, 'r', encoding='utf-8') as qfile, \
                 open(output_file, 'w', encoding='utf-8') as ofile:
             total_time = 0
+            if self.sparse_index is not None:  # The whole query file is scored as one batch
+                lines = [line.strip().split(' ', 1) for line in qfile]
+                start = time.time()
+                batch_results = self.perform_batch([query for _, query in lines])
+                end = time.time()
+                total_time += end - start
+                for (query_id, _), results in zip(lines, batch_results):
+                    for rank, (doc_id, score) in enumerate(results, start=1):
+                        ofile.write(f"{query_id} {doc_id} {rank} {score:.4f}\n")
+                print(f"Queries completed in {total_time:.4f} seconds.")
+                return
+            if workers > 1:
+                queries = [tuple(line.strip().split(' ', 1)) for line in qfile]
+                start = time.time()
+                for query_id, results, duration in self.perform_parallel(queries, workers):
+                    total_time += duration
+                    for rank, (doc_id, score) in enumerate(results, start=1):
+                        ofile.write(f"{query_id} {doc_id} {rank} {score:.4f}\n")
+                end = time.time()
+                # Every worker has its own caches, so only the times are reported
+                print(f"{len(queries)} queries completed in {end - start:.4f} seconds by {workers} workers "
+                      f"({len(queries) / max(end - start, 1e-9):.1f} queries/s, {total_time:.4f} seconds of query time).")
+                return
             for line in qfile:
                 query_id, query = line.strip().split(' ', 1)
                 start = time.time()
                 results = self.perform_query(query)
                 end = time.time()
+                self.report_first_query(end - start)
                 total_time += end - start
                 for rank, (doc_id, score) in enumerate(results, start=1):
                     ofile.write(f"{query_id} {doc_id} {rank} {score:.4f}\n")
             print(f"Queries completed in {total_time:.4f} seconds.")
+            self.report_caches()
 
 
 def main():
     parser = argparse.ArgumentParser(description="Query and retrieve documents.")
-    parser.add_argument('-m', '--mode', type=str, choices=['interactive', 'automatic'], required=True,
+    parser.add_argument('-m', '--mode', type=str, choices=['interactive', 'automatic', 'server'], required=True,
                         help="Mode of operation")
     parser.add_argument('-p', '--path', type=str, required=True, help="Path to the large corpus")
+    parser.add_argument('-e', '--engine', type=str, choices=list(ENGINES), default='exhaustive',
+                        help="Query evaluation strategy: exhaustive term-at-a-time, WAND, Block-Max WAND, MaxScore or automatic")
+    parser.add_argument('-k', '--top-k', type=int, default=15, help="Number of results returned per query")
+    parser.add_argument('--sparse', action='store_true',
+                        help="Score queries with the NumPy sparse matrix backend, automatic mode scores the query file as one batch")
+    parser.add_argument('--in-memory', action='store_true',
+                        help="Load the postings into compact in-memory arrays instead of reading them from the mapped file")
+    parser.add_argument('--warm-up', type=str, default=None,
+                        help="File of hot query terms whose postings are prefetched at startup")
+    parser.add_argument('--postings-cache', type=int, default=0, metavar='MB',
+                        help="Keep the decoded postings of recently queried terms in an LRU cache of this many megabytes")
+    parser.add_argument('--result-cache', type=int, default=1000, metavar='QUERIES',
+                        help="Number of query results kept for repeated queries, 0 disables the result cache")
+    parser.add_argument('-s', '--segments', type=str, default=None, help="Query a segmented index directory instead of the index file")
+    parser.add_argument('--host', type=str, default='127.0.0.1', help="Address the server mode listens on")
+    parser.add_argument('--port', type=int, default=8765, help="Port the server mode listens on")
+    parser.add_argument('--reload-interval', type=float, default=1.0,
+                        help="Seconds between checks for a new index file in server mode, 0 only reloads on request")
+    parser.add_argument('--shared-memory', action='store_true',
+                        help="Copy the index file into shared memory that every query worker process attaches to")
+    parser.add_argument('-w', '--workers', type=int, default=1,
+                        help="Worker processes sharing the index that split the queries of automatic mode")
     args = parser.parse_args()
 
-    index_file_path = os.path.join(os.getcwd(), "21207500-large.index.json")
+    index_file_path = os.path.join(os.getcwd(), "21207500-large.index.bin")
+    if args.segments is not None:
+        index_file_path = args.segments
     stopwords_file_path = os.path.join(args.path, "files", "stopwords.txt")
     if not os.path.exists(stopwords_file_path):  # If the file in stopwords_file_path does not exist, use the project's stopwords.txt file
         print(f"Stopwords file not found at {stopwords_file_path}. Using project's stopwords file.")
         stopwords_file_path = os.path.join(os.getcwd(), "files", "stopwords.txt")
 
-    bm25 = BM25(index_file_path, stopwords_file_path)
+    def load_bm25():
+        return BM25(index_file_path, stopwords_file_path, args.engine, args.top_k, args.sparse, args.in_memory, args.warm_up, args.postings_cache, args.result_cache, args.shared_memory)
 
+    if args.mode == 'server':  # Keep the index resident and answer queries over a local socket, see query_client.py
+        QueryServer(load_bm25, index_file_path, args.reload_interval).run(args.host, args.port)
+        return
+    bm25 = load_bm25()
     if args.mode == 'interactive':
         bm25.interactive_mode()
     elif args.mode == 'automatic':
         queries_file = os.path.join(args.path, "files", "queries.txt")
         output_file = os.path.join(os.getcwd(), "21207500-large.results")
-        bm25.automatic_mode(queries_file, output_file)
+        bm25.automatic_mode(queries_file, output_file, args.workers)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,136 @@
+"""
+Student ID: 21207500
+Student Name: Liyan Tao
+"""
+
+import os
+import json
+import time
+import asyncio
+from segmented_index import MANIFEST_FILE
+
+REQUEST_LIMIT = 2 ** 20  # Longest request line in bytes, asyncio's default of 64 KiB is short for long queries
+
+
+def index_signature(index_path):
+    """Identify the current version of an index: the inode, mtime and size of the index file, or of the manifest of a segmented index. New indexes are renamed into place, so a changed signature means a complete new index."""
+    if os.path.isdir(index_path):
+        index_path = os.path.join(index_path, MANIFEST_FILE)
+    try:
+        stat = os.stat(index_path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+async def read_request(reader):
+    """Return the next request line, b'' at the end of the stream, or None for a line longer than REQUEST_LIMIT, which is skipped up to its end so the next request is read from its start."""
+    too_long = False
+    while True:
+        try:
+            line = await reader.readuntil(b'\n')
+        except asyncio.IncompleteReadError as error:  # End of the stream, possibly after an unterminated last line
+            line = error.partial
+        except asyncio.LimitOverrunError as error:
+            too_long = True
+            await reader.readexactly(error.consumed)  # Discard the part of the line buffered so far
+            continue
+        return None if too_long else line
+
+
+class QueryServer:
+    def __init__(self, load_bm25, index_path, reload_interval=1.0):
+        """Serve queries from a resident index over a local socket, one JSON object per line. load_bm25() builds a BM25 over the current index file; a new one is built and swapped in whenever the index changes."""
+        self.load_bm25 = load_bm25
+        self.index_path = index_path
+        self.reload_interval = reload_interval  # Seconds between checks of the index file, 0 only reloads on request
+        self.signature = index_signature(index_path)
+        self.bm25 = load_bm25()
+        self.generation = 0  # Number of times the index was swapped
+        self.requests = 0
+        self.reload_lock = None  # Created in serve(), inside the event loop
+
+    async def handle_client(self, reader, writer):
+        """Answer the requests of one connection in order until the client closes it."""
+        try:
+            while True:
+                line = await read_request(reader)
+                if line is None:
+                    response = {'error': f"Request longer than {REQUEST_LIMIT} bytes"}
+                elif not line:
+                    break
+                else:
+                    try:
+                        response = await self.handle_request(json.loads(line))
+                    except (ValueError, KeyError, TypeError, OSError) as error:  # Malformed request, or an index that failed to load
+                        response = {'error': str(error)}
+                writer.write((json.dumps(response) + '\n').encode('utf-8'))
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):  # Client gone, or the server is stopping
+            pass
+        finally:
+            writer.close()
+
+    async def handle_request(self, request):
+        """Requests: {"query": text, "k": optional number of results}, {"command": "reload"} or {"command": "stats"}."""
+        if not isinstance(request, dict):
+            raise ValueError("A request must be a JSON object")
+        command = request.get('command', 'query')
+        if command == 'query':
+            if not isinstance(request.get('query'), str):
+                raise ValueError("'query' must be a string")
+            k = request.get('k')
+            if k is not None and (not isinstance(k, int) or isinstance(k, bool) or k < 1):
+                raise ValueError("'k' must be a positive integer or null")
+            self.requests += 1
+            bm25 = self.bm25  # A query keeps the index it started with, even if a new one is swapped in meanwhile
+            start = time.time()
+            # Scoring runs on a worker thread so the event loop keeps accepting and answering other requests
+            results = await asyncio.get_running_loop().run_in_executor(None, bm25.perform_query, request['query'], k)
+            return {'results': results, 'seconds': time.time() - start, 'generation': self.generation}
+        if command == 'reload':
+            await self.reload()
+            return {'generation': self.generation}
+        if command == 'stats':
+            stats = {'requests': self.requests, 'generation': self.generation}
+            if self.bm25.result_cache is not None:
+                stats['result_cache'] = self.bm25.result_cache.stats()
+            return stats
+        raise ValueError(f"Unknown command '{command}'")
+
+    async def reload(self):
+        """Build a BM25 over the index currently on disk and swap it in. Queries already running finish on the old index."""
+        async with self.reload_lock:
+            self.signature = index_signature(self.index_path)  # Taken first, so a change during the load is seen next time
+            bm25 = await asyncio.get_running_loop().run_in_executor(None, self.load_bm25)
+            self.bm25 = bm25  # A single reference assignment, requests see either the old or the new index
+            self.generation += 1
+            print(f"Index reloaded, generation {self.generation}.")
+
+    async def watch_index(self):
+        """Reload the index whenever its file (or segment manifest) is replaced."""
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            if index_signature(self.index_path) not in (self.signature, None):
+                try:
+                    await self.reload()
+                except (OSError, ValueError) as error:  # Keep serving the old index
+                    print(f"Index reload failed: {error}")
+
+    async def serve(self, host, port):
+        self.reload_lock = asyncio.Lock()
+        server = await asyncio.start_server(self.handle_client, host, port, limit=REQUEST_LIMIT)
+        print(f"Serving queries on {host}:{port}")
+        watcher = asyncio.get_running_loop().create_task(self.watch_index()) if self.reload_interval > 0 else None
+        async with server:
+            try:
+                await server.serve_forever()
+            finally:
+                if watcher is not None:
+                    watcher.cancel()
+
+    def run(self, host, port):
+        try:
+            asyncio.run(self.serve(host, port))
+        except KeyboardInterrupt:
+            print("Server stopped.")
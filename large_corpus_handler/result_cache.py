@@ -0,0 +1,54 @@
+"""
+Student ID: 21207500
+Student Name: Liyan Tao
+"""
+
+import threading
+from collections import OrderedDict
+
+
+def query_key(query_terms, k):
+    """Cache key of a processed query: the same terms in any order with the same number of results share an entry."""
+    return tuple(sorted(query_terms)), k
+
+
+class ResultCache:
+    def __init__(self, max_entries):
+        """Keep the final results of the most recently performed queries, evicting the least recently used ones beyond max_entries."""
+        self.max_entries = max_entries
+        self.lock = threading.Lock()  # Queries of a server may share the cache
+        self.entries = OrderedDict()  # { (sorted terms, k): results, ... } from least to most recently used
+        self.generation = None  # Generation of the index snapshot the results were computed on
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, generation):
+        """Return the cached results of a query on this index generation, or None. Results of an older generation are all dropped."""
+        with self.lock:
+            if generation != self.generation:
+                self.entries.clear()
+                self.generation = generation
+            results = self.entries.get(key)
+            if results is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return results
+
+    def put(self, key, generation, results):
+        """Add the results of a query computed on the given index generation."""
+        with self.lock:
+            if generation != self.generation:  # The index changed while the query was running
+                return
+            self.entries[key] = results
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        """Return the cache counters: { hits, misses, evictions, entries }"""
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions, 'entries': len(self.entries)}
@@ -0,0 +1,291 @@
+"""
+Student ID: 21207500
+Student Name: Liyan Tao
+"""
+
+import os
+import math
+import json
+import heapq
+import bisect
+import threading
+from binary_index import BinaryIndexWriter, BinaryIndexReader, DocnoTable, BLOCK_SIZE
+
+MANIFEST_FILE = 'segments.json'
+MERGE_FACTOR = 4  # Number of segments of the same size tier that are merged together
+RECLAIM_RATIO = 0.5  # A segment with more than this fraction of deleted documents is rewritten on its own
+
+
+def tag_terms(terms, i):
+    """Tag the (term, doc ids, term frequencies) records of the i-th merged segment with its position"""
+    for term, doc_ids, tfs, _ in terms:
+        yield term, i, doc_ids, tfs
+
+
+class Segment:
+    def __init__(self, name, reader, deleted):
+        self.name = name
+        self.reader = reader  # Raw term frequency binary index of the segment
+        self.deleted = frozenset(deleted)  # Local doc ids of deleted documents (tombstones)
+        self.total_doc_len = sum(reader.doc_lens)
+        self.live_docs_num = reader.num_docs - len(self.deleted)
+        self.live_doc_len = self.total_doc_len - sum(reader.doc_lens[doc_id] for doc_id in self.deleted)
+
+    def with_deleted(self, deleted):
+        """Return a copy of the segment with a new set of tombstones, the segment file itself never changes."""
+        segment = Segment.__new__(Segment)
+        segment.name = self.name
+        segment.reader = self.reader
+        segment.deleted = frozenset(deleted)
+        segment.total_doc_len = self.total_doc_len
+        segment.live_docs_num = self.reader.num_docs - len(segment.deleted)
+        segment.live_doc_len = self.total_doc_len - sum(self.reader.doc_lens[doc_id] for doc_id in segment.deleted)
+        return segment
+
+
+class SegmentSnapshot:
+    def __init__(self, segments, generation, k, b):
+        self.segments = segments
+        self.generation = generation  # Increases every time the set of segments or tombstones changes
+        self.score_scale = 1  # Impacts are computed as scores at query time, never quantised
+        self.k = k
+        self.b = b
+        self.bases = []  # Global doc id of the first document of each segment
+        base = 0
+        for segment in segments:
+            self.bases.append(base)
+            base += segment.reader.num_docs
+        self.num_docs = sum(segment.live_docs_num for segment in segments)
+        total_doc_len = sum(segment.live_doc_len for segment in segments)
+        self.avg_doc_len = total_doc_len / self.num_docs if self.num_docs > 0 else 0
+
+    def snapshot(self):
+        """A snapshot never changes, so it is its own snapshot."""
+        return self
+
+    def postings(self, term):
+        """Combine the live postings of a term over all segments and score them with the global statistics (N, n_i, avg_len). Returns (global doc ids, BM25 impacts, scale 1) or None."""
+        doc_ids, tfs, doc_lens = [], [], []
+        for segment, base in zip(self.segments, self.bases):
+            postings = segment.reader.postings(term)
+            if postings is None:
+                continue
+            deleted = segment.deleted
+            segment_doc_lens = segment.reader.doc_lens
+            for doc_id, f_ij in zip(postings[0], postings[1]):
+                if doc_id not in deleted:
+                    doc_ids.append(base + doc_id)
+                    tfs.append(f_ij)
+                    doc_lens.append(segment_doc_lens[doc_id])
+        if not doc_ids:
+            return None
+        n_i = len(doc_ids)
+        idf = math.log2(1 + (self.num_docs - n_i + 0.5) / (n_i + 0.5))
+        k, b, avg_doc_len = self.k, self.b, self.avg_doc_len
+        impacts = [idf * ((f_ij * (1 + k)) / (f_ij + k * (1 - b + b * doc_len / avg_doc_len))) for f_ij, doc_len in zip(tfs, doc_lens)]
+        return doc_ids, impacts, 1
+
+    def postings_with_bounds(self, term):
+        """Return (doc ids, impacts, max impact, block maxima, scale 1) of a term. Impacts depend on the global statistics, so the bounds are computed along with them."""
+        postings = self.postings(term)
+        if postings is None:
+            return None
+        doc_ids, impacts, _ = postings
+        block_maxima = [max(impacts[i:i + BLOCK_SIZE]) for i in range(0, len(impacts), BLOCK_SIZE)]
+        return doc_ids, impacts, max(block_maxima), block_maxima, 1
+
+    def prefetch(self, term):
+        """Read the postings of a term of every segment ahead of their first use, see BinaryIndexReader.prefetch()."""
+        found = False
+        for segment in self.segments:
+            found = segment.reader.prefetch(term) or found
+        return found
+
+    def docno(self, doc_id):
+        """Translate a global doc id back to its document name."""
+        i = bisect.bisect_right(self.bases, doc_id) - 1
+        return self.segments[i].reader.docno(doc_id - self.bases[i])
+
+
+class SegmentedIndex:
+    def __init__(self, index_dir, k=1, b=0.75):
+        self.index_dir = index_dir
+        self.lock = threading.Lock()  # Protects the manifest and the current snapshot
+        self.merge_thread = None
+        os.makedirs(index_dir, exist_ok=True)
+        manifest = {'generation': 0, 'next_segment': 0, 'k': k, 'b': b, 'segments': []}
+        manifest_path = os.path.join(index_dir, MANIFEST_FILE)
+        if os.path.exists(manifest_path):
+            with open(manifest_path, 'r', encoding='utf-8') as file:
+                manifest = json.load(file)
+        self.next_segment = manifest['next_segment']
+        segments = []
+        for entry in manifest['segments']:
+            reader = BinaryIndexReader(os.path.join(index_dir, entry['name'] + '.seg'))
+            segments.append(Segment(entry['name'], reader, entry['deleted']))
+        self.current = SegmentSnapshot(segments, manifest['generation'], manifest['k'], manifest['b'])
+
+    def snapshot(self):
+        """Return the current immutable view of the index. Queries use one snapshot from start to end, so merges and updates never change the segments under them."""
+        return self.current
+
+    def postings(self, term):
+        return self.current.postings(term)
+
+    def postings_with_bounds(self, term):
+        return self.current.postings_with_bounds(term)
+
+    def prefetch(self, term):
+        return self.current.prefetch(term)
+
+    def docno(self, doc_id):
+        return self.current.docno(doc_id)
+
+    def commit(self, segments):
+        """Write the manifest for a new list of segments and publish the new snapshot. Must be called with the lock held."""
+        current = self.current
+        manifest = {'generation': current.generation + 1, 'next_segment': self.next_segment, 'k': current.k, 'b': current.b,
+                    'segments': [{'name': segment.name, 'deleted': sorted(segment.deleted)} for segment in segments]}
+        manifest_path = os.path.join(self.index_dir, MANIFEST_FILE)
+        with open(manifest_path + '.tmp', 'w', encoding='utf-8') as file:
+            json.dump(manifest, file)
+        os.replace(manifest_path + '.tmp', manifest_path)  # Atomic, readers either see the old or the new manifest
+        self.current = SegmentSnapshot(segments, manifest['generation'], current.k, current.b)
+
+    def new_segment_path(self):
+        """Reserve the name of a new segment. Must be called with the lock held."""
+        name = f"seg-{self.next_segment:06d}"
+        self.next_segment += 1
+        return name, os.path.join(self.index_dir, name + '.seg')
+
+    def locate(self, docnos):
+        """Find the live documents with the given names: { docno: (segment position, local doc id) }"""
+        wanted = set(docnos)
+        located = {}
+        for i, segment in enumerate(self.current.segments):
+            reader = segment.reader
+            for doc_id in range(reader.num_docs):
+                docno = reader.docno(doc_id)
+                if docno in wanted and doc_id not in segment.deleted:
+                    located[docno] = (i, doc_id)
+        return located
+
+    def tombstone(self, segments, located):
+        """Return a copy of the segment list with the located documents marked as deleted."""
+        deleted = {}
+        for i, doc_id in located.values():
+            deleted.setdefault(i, set()).add(doc_id)
+        return [segment.with_deleted(segment.deleted | deleted[i]) if i in deleted else segment for i, segment in enumerate(segments)]
+
+    def add_documents(self, processor):
+        """Write the documents of a DocumentProcessor into a new segment. Documents that already exist are replaced: their old version is deleted."""
+        if not processor.docs_num:
+            print("No documents to add.")
+            return
+        with self.lock:
+            name, file_path = self.new_segment_path()
+        writer = BinaryIndexWriter(file_path, raw_tf=True)
+        for term, term_postings in processor.iter_postings():
+            writer.add_term(term, term_postings.keys(), term_postings.values())  # The processor's doc ids are the local doc ids of the segment
+        writer.finish(processor.docnos, processor.avg_doc_len, processor.doc_lens)
+        segment = Segment(name, BinaryIndexReader(file_path), [])
+        with self.lock:
+            segments = self.tombstone(self.current.segments, self.locate(processor.docnos))
+            self.commit(segments + [segment])
+        print(f"Added {processor.docs_num} documents as segment {name}.")
+        self.maybe_merge()
+
+    def delete_documents(self, docnos):
+        """Mark documents as deleted. They disappear from results and statistics at once and are dropped for good when their segment is merged."""
+        with self.lock:
+            located = self.locate(docnos)
+            if located:
+                self.commit(self.tombstone(self.current.segments, located))
+        print(f"Deleted {len(located)} documents.")
+        self.maybe_merge()
+        return len(located)
+
+    def select_merge(self, segments):
+        """Tiered merge policy: merge MERGE_FACTOR segments of the same size tier, or rewrite a segment whose documents are mostly deleted."""
+        tiers = {}
+        for segment in segments:
+            tier = int(math.log(max(segment.live_docs_num, 1), MERGE_FACTOR))
+            tiers.setdefault(tier, []).append(segment)
+        for tier in sorted(tiers):
+            if len(tiers[tier]) >= MERGE_FACTOR:
+                return tiers[tier][:MERGE_FACTOR]
+        for segment in segments:
+            if segment.reader.num_docs > 0 and len(segment.deleted) > RECLAIM_RATIO * segment.reader.num_docs:
+                return [segment]
+        return None
+
+    def maybe_merge(self):
+        """Start a merge in a background thread if the merge policy selects segments and no merge is running. Queries keep using the current snapshot meanwhile."""
+        with self.lock:
+            if self.merge_thread is not None and self.merge_thread.is_alive():
+                return
+            selected = self.select_merge(self.current.segments)
+            if selected is None:
+                return
+            self.merge_thread = threading.Thread(target=self.merge_segments, args=(selected,), daemon=True)
+            self.merge_thread.start()
+
+    def wait_for_merges(self):
+        """Block until the running background merge, and the merges it triggers, have finished."""
+        while self.merge_thread is not None and self.merge_thread.is_alive():
+            self.merge_thread.join()
+
+    def merge_segments(self, selected):
+        """Merge the live documents of the selected segments into one new segment, then swap it in for them."""
+        with self.lock:
+            name, file_path = self.new_segment_path()
+        # Documents are renumbered in segment order, skipping the tombstones known when the merge started
+        remaps = []
+        docnos, doc_lens = DocnoTable(), []
+        for segment in selected:
+            remap = {}
+            for doc_id in range(segment.reader.num_docs):
+                if doc_id not in segment.deleted:
+                    remap[doc_id] = docnos.append(segment.reader.docno(doc_id))
+                    doc_lens.append(segment.reader.doc_lens[doc_id])
+            remaps.append(remap)
+        print(f"Merging {len(selected)} segments into {name}...")
+        writer = BinaryIndexWriter(file_path, raw_tf=True)
+        terms = [tag_terms(segment.reader.iter_terms(), i) for i, segment in enumerate(selected)]
+        current_term, merged_doc_ids, merged_tfs = None, [], []
+        for term, i, doc_ids, tfs in heapq.merge(*terms, key=lambda record: record[0]):
+            if term != current_term:
+                if merged_doc_ids:
+                    writer.add_term(current_term, merged_doc_ids, merged_tfs)
+                current_term, merged_doc_ids, merged_tfs = term, [], []
+            remap = remaps[i]
+            for doc_id, f_ij in zip(doc_ids, tfs):
+                if doc_id in remap:
+                    merged_doc_ids.append(remap[doc_id])
+                    merged_tfs.append(f_ij)
+        if merged_doc_ids:
+            writer.add_term(current_term, merged_doc_ids, merged_tfs)
+        writer.finish(docnos, sum(doc_lens) / len(doc_lens) if doc_lens else 0, doc_lens)
+        with self.lock:
+            segments = self.current.segments
+            # Deletes that arrived while merging were applied to the old segments, carry them over to the new one
+            deleted = set()
+            for old, remap in zip(selected, remaps):
+                for latest in segments:
+                    if latest.name == old.name:
+                        deleted.update(remap[doc_id] for doc_id in latest.deleted - old.deleted)
+            merged = Segment(name, BinaryIndexReader(file_path), deleted)
+            selected_names = {segment.name for segment in selected}
+            position = min(i for i, segment in enumerate(segments) if segment.name in selected_names)
+            remaining = [segment for segment in segments if segment.name not in selected_names]
+            remaining.insert(position, merged)
+            self.commit(remaining)
+        for segment in selected:
+            try:
+                os.remove(os.path.join(self.index_dir, segment.name + '.seg'))
+            except OSError:  # Still mapped by an older snapshot on platforms that do not allow it, left for cleanup
+                pass
+        print(f"Merged segments {', '.join(sorted(selected_names))} into {name}.")
+        with self.lock:
+            self.merge_thread = None
+        self.maybe_merge()
@@ -0,0 +1,51 @@
+"""
+Student ID: 21207500
+Student Name: Liyan Tao
+"""
+
+import os
+import weakref
+from multiprocessing import shared_memory
+
+
+class SharedBlock(shared_memory.SharedMemory):
+    def close(self):
+        """Views of the index (postings, doc names) can outlive the block object, then the mapping is released with the last of them."""
+        try:
+            super().close()
+        except BufferError:
+            pass
+
+
+def unlink_shared_memory(block, owner_pid):
+    """Remove the shared memory block, only from the process that created it (forked workers inherit the finalizer)."""
+    if os.getpid() == owner_pid:
+        block.unlink()
+
+
+class SharedIndexFile:
+    def __init__(self, block, size):
+        """A binary index file copied into a block of shared memory. Every process that attaches maps the same physical pages, so extra query workers cost almost no memory for the index."""
+        self.block = block
+        self.size = size  # Size of the index file, the block may be rounded up to whole pages
+        self.buffer = block.buf[:size]
+
+    @classmethod
+    def create(cls, file_path):
+        """Copy an index file into a new shared memory block, removed again once the returned object is no longer used."""
+        size = os.path.getsize(file_path)
+        block = SharedBlock(create=True, size=max(size, 1))
+        with open(file_path, 'rb') as file:
+            file.readinto(block.buf[:size])
+        shared = cls(block, size)
+        weakref.finalize(shared, unlink_shared_memory, block, os.getpid())
+        return shared
+
+    @classmethod
+    def attach(cls, name, size):
+        """Attach to the block created by another process."""
+        return cls(SharedBlock(name=name), size)
+
+    def __reduce__(self):
+        # A worker process that is not forked receives the name of the block and attaches to it instead of a copy
+        return SharedIndexFile.attach, (self.block.name, self.size)
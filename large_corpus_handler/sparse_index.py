@@ -0,0 +1,68 @@
+"""
+Student ID: 21207500
+Student Name: Liyan Tao
+"""
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional, only the sparse backend needs it
+    np = None
+
+
+class SparseIndex:
+    def __init__(self, reader):
+        """Copy the BM25 impacts of a binary index into a CSR term x document matrix: row i holds the postings of the i-th term, as stored (float32 impacts or quantised codes) with the scale of the row."""
+        if np is None:
+            raise ImportError("The sparse backend needs NumPy, install it with 'pip install numpy'.")
+        if reader.raw_tf:
+            raise ValueError("The sparse backend needs an index of BM25 impacts, not raw term frequencies.")
+        self.reader = reader
+        self.num_docs = reader.num_docs
+        self.rows = {}  # { term: row, ... }
+        self.scales = []  # Scale of every row, 1 unless the codes are quantised with one scale per term
+        indices = []
+        data = []
+        for row, (term, doc_ids, impacts, scale) in enumerate(reader.iter_terms()):
+            self.rows[term] = row
+            self.scales.append(scale)
+            indices.append(np.asarray(doc_ids))  # Views over the mapped file, copied once by the concatenation below
+            data.append(np.asarray(impacts))
+        self.indptr = np.zeros(len(indices) + 1, dtype=np.int64)
+        np.cumsum([len(row_indices) for row_indices in indices], out=self.indptr[1:])
+        self.indices = np.concatenate(indices).astype(np.int32) if indices else np.zeros(0, dtype=np.int32)
+        self.data = np.concatenate(data).astype(np.float32) if data else np.zeros(0, dtype=np.float32)  # float32 holds every 8 and 16 bit code exactly
+
+    def nbytes(self):
+        """Memory used by the CSR arrays."""
+        return self.indptr.nbytes + self.indices.nbytes + self.data.nbytes
+
+    def score_batch(self, batch_query_terms, k):
+        """Score a list of processed queries and return the top k (doc_id, score) pairs of each, ties by doc id. Queries are scored one at a time into a single dense score row, so the memory used does not grow with the batch."""
+        scores = np.zeros(self.num_docs)
+        results = []
+        for query_terms in batch_query_terms:
+            # Product of the sparse query vector and the CSR matrix. Scores are float64 and added in query term order, exactly as the exhaustive engine does.
+            for term in query_terms:
+                row = self.rows.get(term)
+                if row is None:  # Term does not appear in the collection
+                    continue
+                begin, end = self.indptr[row], self.indptr[row + 1]
+                impacts = self.data[begin:end]
+                if self.scales[row] != 1:  # Scaled once per term, in float64 like the other engines
+                    impacts = impacts.astype(np.float64) * self.scales[row]
+                scores[self.indices[begin:end]] += impacts
+            matched = np.flatnonzero(scores)
+            results.append(self.top_k(scores, matched[scores[matched] > 0], k))
+            scores[matched] = 0  # Reset only the documents the query touched
+        return results
+
+    def top_k(self, scores, candidates, k):
+        """Select the top k of the candidate documents of a score row with partition; only matched (positive) scores are candidates."""
+        candidate_scores = scores[candidates]
+        if k < len(candidates):
+            # k-th largest score; partition does not order the ties, so every candidate scoring at least that much is kept and the ties are broken by doc id below
+            kth = np.partition(candidate_scores, len(candidates) - k)[len(candidates) - k]
+            keep = candidate_scores >= kth
+            candidates, candidate_scores = candidates[keep], candidate_scores[keep]
+        order = np.lexsort((candidates, -candidate_scores))[:k]
+        return [(int(doc_id), float(score)) for doc_id, score in zip(candidates[order], candidate_scores[order])]
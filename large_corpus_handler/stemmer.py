@@ -0,0 +1,216 @@
+"""
+Student ID: 21207500
+Student Name: Liyan Tao
+"""
+
+import os
+import sys
+import time
+
+STEM_TABLE_FILE = '21207500-large.stems.txt'  # Saved next to the index file, or inside a segmented index directory
+
+
+# Translation table of ASCII words to their consonant/vowel form: a, e, i, o, u are 'v' and every other character 'c'; y depends on its neighbour and is resolved separately
+CONSONANTS = str.maketrans({chr(code): 'v' if chr(code) in 'aeiou' else 'c' for code in range(128)})
+
+# Suffix rules of steps 2, 3 and 4 in the order files/porter.py tries them
+STEP2_RULES = [('ational', 'ate'), ('tional', 'tion'), ('enci', 'ence'), ('anci', 'ance'), ('izer', 'ize'), ('bli', 'ble'),
+               ('alli', 'al'), ('entli', 'ent'), ('eli', 'e'), ('ousli', 'ous'), ('ization', 'ize'), ('ation', 'ate'),
+               ('ator', 'ate'), ('alism', 'al'), ('iveness', 'ive'), ('fulness', 'ful'), ('ousness', 'ous'), ('aliti', 'al'),
+               ('iviti', 'ive'), ('biliti', 'ble'), ('logi', 'log')]
+STEP3_RULES = [('icate', 'ic'), ('ative', ''), ('alize', 'al'), ('iciti', 'ic'), ('ical', 'ic'), ('ful', ''), ('ness', '')]
+STEP4_SUFFIXES = ['al', 'ance', 'ence', 'er', 'ic', 'able', 'ible', 'ant', 'ement', 'ment', 'ent', 'ion', 'ou', 'ism', 'ate', 'iti',
+                  'ous', 'ive', 'ize']
+
+
+def by_ending(rules):
+    """Group suffix rules by the last two letters of the suffix, keeping their order. The original branches on one of these letters and then tries each suffix, so only the rules of the word's own ending can match."""
+    table = {}
+    for rule in rules:
+        suffix = rule if isinstance(rule, str) else rule[0]
+        table.setdefault(suffix[-2:], []).append(rule)
+    return table
+
+
+STEP2_TABLE = by_ending(STEP2_RULES)
+STEP3_TABLE = by_ending(STEP3_RULES)
+STEP4_TABLE = by_ending(STEP4_SUFFIXES)
+
+
+def consonant_form(b):
+    """Return a string with 'c' or 'v' for every character of b, as PorterStemmer.cons() classifies it: y is a consonant at the start of a word or after a vowel."""
+    if b.isascii():
+        form = b.translate(CONSONANTS)
+        if 'y' not in b:
+            return form
+    else:
+        form = ['v' if ch in 'aeiou' else 'c' for ch in b]  # Rare non-ASCII words
+    form = list(form)
+    previous = 'v'
+    for i, ch in enumerate(b):
+        if ch == 'y':
+            form[i] = 'c' if previous == 'v' else 'v'
+        previous = form[i]
+    return ''.join(form)
+
+
+def replace_suffix(b, k, form, rules):
+    """Apply the first (suffix, replacement) rule whose suffix ends b[:k + 1], if the stem before it has m() > 0, and return the new (b, k, form)."""
+    for suffix, replacement in rules:
+        if b.endswith(suffix, 0, k + 1):
+            j = k - len(suffix)
+            if form.count('vc', 0, j + 1) > 0:
+                # Like PorterStemmer.setto(), the replacement overwrites as many characters as it has and keeps the rest of the buffer
+                b = b[:j + 1] + replacement + b[j + len(replacement) + 1:]
+                k = j + len(replacement)
+                form = consonant_form(b)
+            break
+    return b, k, form
+
+
+class FastPorterStemmer:
+    def stem(self, p):
+        """Stem a lowercase word with exactly the output of files/porter.py. The buffer b and end k follow the original, but the consonant/vowel class of every character is computed once per change of the buffer, so m() and vowelinstem() become str.count/str.find over that form instead of per-character method calls."""
+        k = len(p) - 1
+        if k <= 1:
+            return p  # Words of 1 or 2 letters are not stemmed
+        b = p
+        form = consonant_form(b)
+
+        # Step 1ab: plurals and -ed or -ing
+        if b[k] == 's':
+            if b.endswith('sses', 0, k + 1):
+                k -= 2
+            elif b.endswith('ies', 0, k + 1):
+                b = b[:k - 2] + 'i' + b[k - 1:]
+                k -= 2
+                form = consonant_form(b)
+            elif b[k - 1] != 's':
+                k -= 1
+        last = b[k]  # The suffixes of a step are only compared once their last letter matches, like the 'tiny speed-up' of ends()
+        if last == 'd' and b.endswith('eed', 0, k + 1):
+            if form.count('vc', 0, k - 2) > 0:
+                k -= 1
+        elif last == 'd' or last == 'g':
+            j = k - 2 if b.endswith('ed', 0, k + 1) else k - 3 if b.endswith('ing', 0, k + 1) else None
+            if j is not None and form.find('v', 0, j + 1) >= 0:
+                k = j
+                if b[k] in 'tlz' and (b.endswith('at', 0, k + 1) or b.endswith('bl', 0, k + 1) or b.endswith('iz', 0, k + 1)):
+                    b = b[:k + 1] + 'e' + b[k + 2:]  # -at, -bl, -iz become -ate, -ble, -ize
+                    k += 1
+                    form = consonant_form(b)
+                elif k >= 1 and b[k] == b[k - 1] and form[k] == 'c':
+                    if b[k] not in 'lsz':
+                        k -= 1
+                elif form.count('vc', 0, k + 1) == 1 and k >= 2 and form[k - 2:k + 1] == 'cvc' and b[k] not in 'wxy':
+                    b = b[:k + 1] + 'e' + b[k + 2:]
+                    k += 1
+                    form = consonant_form(b)
+
+        # Step 1c: terminal y to i when there is another vowel in the stem
+        if b[k] == 'y' and form.find('v', 0, k) >= 0:
+            b = b[:k] + 'i' + b[k + 1:]
+            form = consonant_form(b)
+
+        # Steps 2 and 3: double suffixes to single ones, then -ic-, -full, -ness etc.
+        rules = STEP2_TABLE.get(b[k - 1:k + 1])
+        if rules is not None:
+            b, k, form = replace_suffix(b, k, form, rules)
+        rules = STEP3_TABLE.get(b[k - 1:k + 1])
+        if rules is not None:
+            b, k, form = replace_suffix(b, k, form, rules)
+
+        # Step 4: take off -ant, -ence etc. when the stem before them has m() > 1
+        for suffix in STEP4_TABLE.get(b[k - 1:k + 1], ()):
+            if b.endswith(suffix, 0, k + 1):
+                j = k - len(suffix)
+                if suffix == 'ion' and b[j] not in 'st':
+                    break
+                if form.count('vc', 0, j + 1) > 1:
+                    k = j
+                break
+
+        # Step 5: remove a final -e and change -ll to -l when m() > 1, both measured on the word before this step
+        measure = form.count('vc', 0, k + 1)
+        if b[k] == 'e':
+            if measure > 1 or (measure == 1 and not (k >= 3 and form[k - 3:k] == 'cvc' and b[k - 1] not in 'wxy')):
+                k -= 1
+        if b[k] == 'l' and k >= 1 and b[k - 1] == 'l' and form[k] == 'c' and measure > 1:
+            k -= 1
+        return b[:k + 1]
+
+
+class StemTable(dict):
+    def __init__(self, stem_table_path=None, track_added=False, max_new_words=None):
+        """Memoise the stem of every word seen as { word: stem }, starting from the table saved with the index if there is one, so indexing runs and query processes start warm. Looking up a new word stems it. track_added collects the new words for take_added() (indexing processes only); at most max_new_words new words are memoised, so a long running query process does not grow without limit."""
+        super().__init__()
+        self.stem_table_path = stem_table_path
+        self.stemmer = FastPorterStemmer()
+        self.track_added = track_added
+        self.max_new_words = max_new_words
+        self.new_words = 0  # Words memoised since the table was loaded
+        self.added = {}  # Words stemmed since the last take_added(), sent back from worker processes
+        self.modified = False  # Words were added since the table was loaded
+        if stem_table_path is not None and os.path.exists(stem_table_path):
+            with open(stem_table_path, 'r', encoding='utf-8') as file:
+                self.update(line.split() for line in file)
+
+    def __missing__(self, word):
+        stem = self.stemmer.stem(word)
+        if self.max_new_words is not None and self.new_words >= self.max_new_words:
+            return stem  # Table is full, stem without memoising
+        self[word] = stem
+        self.new_words += 1
+        if self.track_added:
+            self.added[word] = stem
+        self.modified = True
+        return stem
+
+    def drop_stopwords(self, stopwords):
+        """Map the stopwords to an empty stem, so a single lookup per token both removes stopwords and stems the other words. They are never saved."""
+        self.update(dict.fromkeys(stopwords, ''))
+
+    def take_added(self):
+        """Return the words stemmed since the last call and start collecting new ones."""
+        added = self.added
+        self.added = {}
+        return added
+
+    def merge(self, added):
+        """Add the stems a worker process computed."""
+        if added:
+            self.update(added)
+            self.modified = True
+
+    def save(self):
+        """Write the table next to the index, one 'word stem' pair per line, if any word was added."""
+        if self.stem_table_path is None or not self.modified:
+            return
+        temp_path = self.stem_table_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            file.writelines(f"{word} {stem}\n" for word, stem in self.items() if stem)
+        os.replace(temp_path, self.stem_table_path)  # Readers never see a half written table
+        self.modified = False
+
+
+def main():
+    """Check that the fast stemmer gives the same stems as files/porter.py for every distinct word of the given text files, and compare their speed."""
+    from files import porter
+    words = set()
+    for file_path in sys.argv[1:]:
+        with open(file_path, 'r', encoding='utf-8') as file:
+            words.update(file.read().lower().split())
+    words = sorted(words)
+    results = []
+    for stemmer in (porter.PorterStemmer(), FastPorterStemmer()):
+        start = time.time()
+        results.append([stemmer.stem(word) for word in words])
+        print(f"{type(stemmer).__name__}: {len(words)} words in {time.time() - start:.4f} seconds.")
+    mismatches = [(word, original, fast) for word, original, fast in zip(words, *results) if original != fast]
+    print(f"{len(mismatches)} mismatches.")
+    for word, original, fast in mismatches[:20]:
+        print(f"{word}: {original} != {fast}")
+
+
+if __name__ == "__main__":
+    main()
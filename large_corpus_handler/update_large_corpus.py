@@ -0,0 +1,62 @@
+"""
+Student ID: 21207500
+Student Name: Liyan Tao
+"""
+
+import os
+import time
+import argparse
+from index_large_corpus import DocumentProcessor
+from segmented_index import SegmentedIndex
+from corpus_manifest import CorpusManifest, MANIFEST_FILE
+from stemmer import STEM_TABLE_FILE
+
+
+def sync_documents(index, documents_path, stopwords_path, workers):
+    """Bring the segmented index in line with a documents directory: only files added, changed or removed since the last sync are processed"""
+    manifest = CorpusManifest(os.path.join(index.index_dir, MANIFEST_FILE))
+    changed_paths, removed_docnos, entries = manifest.scan(documents_path)
+    print(f"{len(changed_paths)} documents added or changed, {len(removed_docnos)} documents removed.")
+    changed_docnos = {os.path.basename(file_path) for file_path in changed_paths}
+    removed_docnos = [docno for docno in removed_docnos if docno not in changed_docnos]  # Moved files are replaced by the add below
+    if removed_docnos:
+        index.delete_documents(removed_docnos)
+    if changed_paths:
+        index.add_documents(DocumentProcessor(documents_path, stopwords_path, workers, file_paths=changed_paths,
+                                              stem_table_path=os.path.join(index.index_dir, STEM_TABLE_FILE)))
+    manifest.save(entries)  # Saved after the index, an interrupted sync is simply redone next time
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Add or delete documents in a segmented index.")
+    parser.add_argument('-p', '--path', type=str, required=True, help="Path to the large corpus")
+    parser.add_argument('-s', '--segments', type=str, default=os.path.join(os.getcwd(), "21207500-large.segments"),
+                        help="Directory of the segmented index")
+    parser.add_argument('-a', '--add', type=str, default=None,
+                        help="Documents directory (with GX subdirectories) to add as a new segment")
+    parser.add_argument('-d', '--delete', type=str, nargs='+', default=[], help="Names of the documents to delete")
+    parser.add_argument('-y', '--sync', action='store_true',
+                        help="Re-index only the documents of the corpus that were added, changed or removed since the last sync")
+    parser.add_argument('-w', '--workers', type=int, default=1, help="Number of processes used to preprocess the documents")
+    args = parser.parse_args()
+
+    stopwords_path = os.path.join(args.path, "files", "stopwords.txt")
+
+    start = time.time()
+    index = SegmentedIndex(args.segments)
+    if args.add is not None:
+        index.add_documents(DocumentProcessor(args.add, stopwords_path, args.workers,
+                                              stem_table_path=os.path.join(args.segments, STEM_TABLE_FILE)))
+    if args.delete:
+        index.delete_documents(args.delete)
+    if args.sync:
+        sync_documents(index, os.path.join(args.path, "documents"), stopwords_path, args.workers)
+    index.wait_for_merges()  # Let a background merge finish before the process exits
+    end = time.time()
+    snapshot = index.snapshot()
+    print(f"Index has {snapshot.num_docs} documents in {len(snapshot.segments)} segments.")
+    print(f"Update completed in {end - start:.2f} seconds.")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,22 +4,40 @@ Student Name: Liyan Tao
 """
 
 import os
+import sys
 import json
+import heapq
+from array import array
 import argparse
 from files import porter
 import time
 
 
 class BM25:
-    def __init__(self, index_file_path, stopwords_file_path):
+    def __init__(self, index_file_path, stopwords_file_path, top_k=15):
+        self.top_k = top_k  # Number of results returned per query
+        self.docnos = []  # Doc names by integer doc id, in index order
         self.index = self.load_index(index_file_path)
         self.stopwords = self.load_stopwords(stopwords_file_path)
         self.stemmer = porter.PorterStemmer()
 
     def load_index(self, index_file_path):
-        """Load the index file into memory."""
+        """Load the index file into memory as compact postings: { term: (array('I') of doc ids, array('d') of scores), ... }."""
         with open(index_file_path, 'r', encoding='utf-8') as file:
-            index = json.load(file)
+            documents = json.load(file)  # { doc: { term: score, ... }, ... }
+        index = {}
+        for doc_id, (docno, doc_terms) in enumerate(documents.items()):
+            self.docnos.append(docno)
+            for term, score in doc_terms.items():
+                if term not in index:
+                    index[term] = (array('I'), array('d'))
+                index[term][0].append(doc_id)
+                index[term][1].append(score)
+        # Report the memory held by the index: term keys, tuples and arrays
+        num_postings = sum(len(doc_ids) for doc_ids, _ in index.values())
+        size = sys.getsizeof(index) + sum(sys.getsizeof(term) + sys.getsizeof(postings) + sys.getsizeof(postings[0]) + sys.getsizeof(postings[1])
+                                          for term, postings in index.items())
+        print(f"Index of {num_postings} postings uses {size / 2 ** 20:.1f} MB, {size / max(num_postings, 1):.1f} bytes per posting.")
         return index
 
     def load_stopwords(self, stopwords_file):
@@ -35,17 +53,19 @@ class BM25:
         terms = [self.stemmer.stem(term) for term in terms]  # Perform stemming
         return terms
 
-    def perform_query(self, query):
-        """Perform the query and return sorted results"""
+    def perform_query(self, query, k=None):
+        """Perform the query and return the top k sorted results (top_k by default)"""
         query_terms = self.process_query(query)
-        results = {}
-        for doc_id, doc_terms in self.index.items():
-            score = sum(doc_terms.get(term, 0) for term in query_terms)
-            if score > 0:
-                results[doc_id] = score
-        # Sort results by score in descending order and return the top 15 results, or all results if fewer than 15
-        sorted_results = sorted(results.items(), key=lambda x: x[1], reverse=True)[:15]
-        return sorted_results
+        accumulators = {}  # { doc_id: score, ... }
+        for term in query_terms:
+            if term not in self.index:
+                continue
+            for doc_id, score in zip(*self.index[term]):
+                accumulators[doc_id] = accumulators.get(doc_id, 0) + score
+        results = ((doc_id, score) for doc_id, score in accumulators.items() if score > 0)
+        # Select the top k results by score in descending order with a bounded heap instead of sorting every match, ties in index order
+        sorted_results = heapq.nsmallest(k or self.top_k, results, key=lambda x: (-x[1], x[0]))
+        return [(self.docnos[doc_id], score) for doc_id, score in sorted_results]
 
     def interactive_mode(self):
         """Interactive mode: input queries and print results."""
@@ -87,6 +107,7 @@ def main():
     parser.add_argument('-m', '--mode', type=str, choices=['interactive', 'automatic'], required=True,
                         help="Mode of operation")
     parser.add_argument('-p', '--path', type=str, required=True, help="Path to the small corpus")
+    parser.add_argument('-k', '--top-k', type=int, default=15, help="Number of results returned per query")
     args = parser.parse_args()
 
     index_file_path = os.path.join(os.getcwd(), "21207500-small.index.json")
@@ -94,7 +115,7 @@ def main():
     if not os.path.exists(stopwords_file_path):  # If the file in stopwords_file_path does not exist, use the project's stopwords.txt file
         print(f"Stopwords file not found at {stopwords_file_path}. Using project's stopwords file.")
         stopwords_file_path = os.path.join(os.getcwd(), "files", "stopwords.txt")
-    bm25 = BM25(index_file_path, stopwords_file_path)
+    bm25 = BM25(index_file_path, stopwords_file_path, args.top_k)
 
     if args.mode == 'interactive':
         bm25.interactive_mode()